@@ -1,23 +1,37 @@
 from fastapi import FastAPI, HTTPException, Depends, Header, Request
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, Response, PlainTextResponse
 from pydantic import BaseModel, EmailStr, Field
 from typing import Optional, List, Dict, Any
 from jose import jwt
 from datetime import datetime, timedelta
 from surreal_client import SurrealClient
+from sharded_client import ShardedSurrealClient, parse_shard_spec
+from query_cache import QueryCache
+from rating_queue import RatingWriteQueue, RatingQueueFull, RatingQueueClosed
+from passwords import PasswordHasher, LoginThrottle, HasherBusy
+from profiler import Profiler, ProfilerBusy, SlowRequestMiddleware, to_speedscope, to_collapsed
+from change_feed import ChangeFeedSubscriber, ChangeEvent
+from change_log import ChangeLog, graph_delta, movies_delta
+from graph_snapshot import SnapshotManager, export_snapshot
+from graph_codec import GRAPH_BINARY_MEDIA_TYPE, encode_graph_binary, wants_graph_binary
 from pathlib import Path
 import os
+import re
 import traceback
 
 app = FastAPI(title="CineBrain API", version="1.0.0")
 
+# Record keys are spliced into SurrealQL, so only plain identifiers are accepted
+RECORD_KEY_RE = re.compile(r"^[A-Za-z0-9_]+$")
+
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["http://localhost:3000", "http://localhost:5173"],
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Graph-Version"],
 )
 
 @app.exception_handler(Exception)
@@ -38,16 +52,117 @@ SURREAL_USER = os.getenv("SURREAL_USER", "root")
 SURREAL_PASS = os.getenv("SURREAL_PASS", "root")
 SURREAL_NS = os.getenv("SURREAL_NS", "test")
 SURREAL_DB = os.getenv("SURREAL_DB", "test")
+# Comma-separated url|namespace|database entries; users are partitioned across them
+SURREAL_SHARDS = os.getenv("SURREAL_SHARDS", "")
 JWT_SECRET = os.getenv("JWT_SECRET", "secret-key-change-in-production")
 JWT_ALGORITHM = "HS256"
+RATING_WRITE_BEHIND = os.getenv("RATING_WRITE_BEHIND", "false").lower() in ("1", "true", "yes")
+RATING_QUEUE_MAX_SIZE = int(os.getenv("RATING_QUEUE_MAX_SIZE", "1000"))
+RATING_BATCH_SIZE = int(os.getenv("RATING_BATCH_SIZE", "50"))
+RATING_FLUSH_INTERVAL_MS = int(os.getenv("RATING_FLUSH_INTERVAL_MS", "50"))
+QUERY_CACHE_ENABLED = os.getenv("QUERY_CACHE_ENABLED", "false").lower() in ("1", "true", "yes")
+QUERY_CACHE_MAX_ENTRIES = int(os.getenv("QUERY_CACHE_MAX_ENTRIES", "1000"))
+QUERY_CACHE_MAX_BYTES = int(os.getenv("QUERY_CACHE_MAX_BYTES", str(32 * 1024 * 1024)))
+QUERY_CACHE_TTL = float(os.getenv("QUERY_CACHE_TTL", "60"))
+# table=seconds pairs, e.g. "movie=300,rated=5"; a query uses the shortest TTL of its tables
+QUERY_CACHE_TABLE_TTLS = {
+    table.strip().lower(): float(ttl)
+    for table, _, ttl in (pair.partition("=") for pair in os.getenv("QUERY_CACHE_TABLE_TTLS", "").split(","))
+    if table.strip() and ttl.strip()
+}
+PASSWORD_HASH_WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS", "2"))
+PASSWORD_HASH_MAX_PENDING = int(os.getenv("PASSWORD_HASH_MAX_PENDING", "16"))
+LOGIN_MAX_FAILURES = int(os.getenv("LOGIN_MAX_FAILURES", "10"))
+LOGIN_FAILURE_WINDOW = float(os.getenv("LOGIN_FAILURE_WINDOW", "300"))
+# Opt-in migration aid: accounts registered before passwords were stored have none and
+# may log in with this value once, after which a real hash is written for them. Empty
+# (the default) means such accounts cannot log in until their password is reset.
+LEGACY_DEFAULT_PASSWORD = os.getenv("LEGACY_DEFAULT_PASSWORD", "")
+CHANGE_FEED_ENABLED = os.getenv("CHANGE_FEED_ENABLED", "false").lower() in ("1", "true", "yes")
+CHANGE_FEED_RETENTION = os.getenv("CHANGE_FEED_RETENTION", "1d")
+CHANGE_FEED_POLL_MS = int(os.getenv("CHANGE_FEED_POLL_MS", "250"))
+CHANGE_LOG_MAX_EVENTS = int(os.getenv("CHANGE_LOG_MAX_EVENTS", "50000"))
+CHANGE_LOG_REPLAY_SECONDS = float(os.getenv("CHANGE_LOG_REPLAY_SECONDS", "3600"))
+CHANGE_LOG_MAX_DELTA = int(os.getenv("CHANGE_LOG_MAX_DELTA", "5000"))
+GRAPH_SNAPSHOT_DIR = os.getenv("GRAPH_SNAPSHOT_DIR", "")
+GRAPH_SNAPSHOT_REFRESH_SECONDS = float(os.getenv("GRAPH_SNAPSHOT_REFRESH_SECONDS", "5"))
+ADMIN_EMAILS = {e.strip().lower() for e in os.getenv("ADMIN_EMAILS", "").split(",") if e.strip()}
+PROFILER_SAMPLE_INTERVAL_MS = float(os.getenv("PROFILER_SAMPLE_INTERVAL_MS", "5"))
+PROFILER_SLOW_REQUEST_MS = float(os.getenv("PROFILER_SLOW_REQUEST_MS", "1000"))
+PROFILER_MAX_CAPTURES = int(os.getenv("PROFILER_MAX_CAPTURES", "20"))
+
+query_cache: Optional[QueryCache] = None
+if QUERY_CACHE_ENABLED:
+    query_cache = QueryCache(
+        max_entries=QUERY_CACHE_MAX_ENTRIES,
+        max_bytes=QUERY_CACHE_MAX_BYTES,
+        ttl=QUERY_CACHE_TTL,
+        table_ttls=QUERY_CACHE_TABLE_TTLS
+    )
+
+if SURREAL_SHARDS:
+    surreal_client = ShardedSurrealClient(
+        parse_shard_spec(SURREAL_SHARDS, SURREAL_USER, SURREAL_PASS),
+        cache=query_cache
+    )
+else:
+    surreal_client = SurrealClient(
+        url=SURREAL_URL,
+        user=SURREAL_USER,
+        password=SURREAL_PASS,
+        namespace=SURREAL_NS,
+        database=SURREAL_DB,
+        cache=query_cache
+    )
 
-surreal_client = SurrealClient(
-    url=SURREAL_URL,
-    user=SURREAL_USER,
-    password=SURREAL_PASS,
-    namespace=SURREAL_NS,
-    database=SURREAL_DB
+profiler = Profiler(
+    interval=PROFILER_SAMPLE_INTERVAL_MS / 1000.0,
+    slow_request_threshold=PROFILER_SLOW_REQUEST_MS / 1000.0,
+    max_captures=PROFILER_MAX_CAPTURES
 )
+surreal_client.query_listeners.append(profiler.record_query)
+
+app.add_middleware(SlowRequestMiddleware, profiler=profiler)
+
+password_hasher = PasswordHasher(max_workers=PASSWORD_HASH_WORKERS, max_pending=PASSWORD_HASH_MAX_PENDING)
+login_throttle = LoginThrottle(max_attempts=LOGIN_MAX_FAILURES, window=LOGIN_FAILURE_WINDOW)
+
+change_feed: Optional[ChangeFeedSubscriber] = None
+change_log: Optional[ChangeLog] = None
+if CHANGE_FEED_ENABLED and SURREAL_SHARDS:
+    # Versionstamps are per database, so one cursor cannot follow several shards
+    print("CHANGE_FEED_ENABLED is ignored when SURREAL_SHARDS is set")
+elif CHANGE_FEED_ENABLED:
+    change_feed = ChangeFeedSubscriber(
+        surreal_client,
+        retention=CHANGE_FEED_RETENTION,
+        poll_interval=CHANGE_FEED_POLL_MS / 1000.0,
+        replay_window=CHANGE_LOG_REPLAY_SECONDS
+    )
+    change_log = ChangeLog(max_events=CHANGE_LOG_MAX_EVENTS)
+    change_feed.subscribe(change_log.record)
+    
+    if query_cache is not None:
+        # Writes handled by other workers reach this worker's cache through the feed
+        def invalidate_query_cache(event: ChangeEvent) -> None:
+            if event.action != "checkpoint":
+                query_cache.invalidate({event.table})
+        
+        change_feed.subscribe(invalidate_query_cache)
+
+snapshot_manager: Optional[SnapshotManager] = None
+snapshot_watch_task = None
+if GRAPH_SNAPSHOT_DIR:
+    snapshot_manager = SnapshotManager(Path(GRAPH_SNAPSHOT_DIR))
+
+rating_queue: Optional[RatingWriteQueue] = None
+if RATING_WRITE_BEHIND:
+    rating_queue = RatingWriteQueue(
+        surreal_client,
+        max_size=RATING_QUEUE_MAX_SIZE,
+        batch_size=RATING_BATCH_SIZE,
+        flush_interval=RATING_FLUSH_INTERVAL_MS / 1000.0
+    )
 
 async def load_fixtures() -> None:
     # Try multiple possible paths for the fixtures file
@@ -106,6 +221,7 @@ async def load_fixtures() -> None:
 @app.on_event("startup")
 async def startup():
     import asyncio
+    global snapshot_watch_task
     
     max_retries = 5
     retry_delay = 2
@@ -166,9 +282,28 @@ async def startup():
             import traceback
             print(traceback.format_exc())
 
+    if change_feed is not None:
+        await change_feed.start()
+        print(f"Change feed subscriber started for tables: {', '.join(change_feed.tables)}")
+    
+    if snapshot_manager is not None:
+        snapshot_manager.refresh()
+        snapshot_watch_task = asyncio.create_task(snapshot_manager.watch(GRAPH_SNAPSHOT_REFRESH_SECONDS))
+    
+    if rating_queue is not None:
+        await rating_queue.start()
+        print(f"Rating write-behind queue enabled (batch size {RATING_BATCH_SIZE}, flush interval {RATING_FLUSH_INTERVAL_MS}ms)")
+
 @app.on_event("shutdown")
 async def shutdown():
+    if rating_queue is not None:
+        await rating_queue.shutdown()
+    if change_feed is not None:
+        await change_feed.stop()
+    if snapshot_watch_task is not None:
+        snapshot_watch_task.cancel()
     await surreal_client.close()
+    password_hasher.shutdown()
 
 class UserCreate(BaseModel):
     name: str
@@ -216,6 +351,11 @@ def get_current_user(authorization: Optional[str] = Header(None)) -> Dict[str, A
     except jwt.InvalidTokenError:
         raise HTTPException(status_code=401, detail="Invalid token")
 
+def get_admin_user(current_user: Dict[str, Any] = Depends(get_current_user)) -> Dict[str, Any]:
+    if (current_user.get("email") or "").lower() not in ADMIN_EMAILS:
+        raise HTTPException(status_code=403, detail="Admin access required")
+    return current_user
+
 def create_token(user_id: str, email: str) -> str:
     payload = {
         "sub": user_id,
@@ -232,56 +372,71 @@ async def register(user_data: UserCreate) -> Dict[str, Any]:
     if existing_users:
         raise HTTPException(status_code=400, detail="User with this email already exists")
     
+    try:
+        password_hash = await password_hasher.hash(user_data.password)
+    except HasherBusy as e:
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "1"})
+    
     user_id = user_data.email.split("@")[0].lower().replace(".", "_")
     user = await surreal_client.create(
         "user",
         {
             "name": user_data.name,
             "email": user_data.email,
-            "age": user_data.age
+            "age": user_data.age,
+            "password": password_hash
         },
         user_id
     )
     
+    if isinstance(user, dict):
+        user = {k: v for k, v in user.items() if k != "password"}
+    
     token = create_token(f"user:{user_id}", user_data.email)
     return {"token": token, "user": user}
 
 @app.post("/api/auth/login")
-async def login(credentials: UserLogin) -> Dict[str, Any]:
+async def login(credentials: UserLogin, request: Request) -> Dict[str, Any]:
+    client_ip = request.client.host if request.client else "unknown"
+    # Failures are not cleared on success: logging into one account must not buy more
+    # guesses against another from the same address
+    retry_after = login_throttle.retry_after(client_ip)
+    if retry_after is not None:
+        raise HTTPException(status_code=429, detail="Too many failed login attempts", headers={"Retry-After": str(retry_after)})
+    
     try:
-        if credentials.password != "password123":
-            raise HTTPException(status_code=401, detail="Invalid credentials")
-        
         users = await surreal_client.query(
             f"SELECT * FROM user WHERE email = '{credentials.email}';"
         )
-        if not users:
-            raise HTTPException(status_code=401, detail="Invalid credentials")
+        user = users[0] if users else None
         
-        user = users[0]
+        stored_password = None
+        if isinstance(user, dict):
+            stored_password = user.get("password") or LEGACY_DEFAULT_PASSWORD or None
         
-        if not isinstance(user, dict):
-            if isinstance(user, str):
-                user_id = user.replace("user:", "").split(":")[0] if ":" in user else user
-            else:
-                raise HTTPException(status_code=500, detail=f"Unexpected user data format: {type(user)}")
+        if not await password_hasher.verify(credentials.password, stored_password):
+            login_throttle.record_failure(client_ip)
+            raise HTTPException(status_code=401, detail="Invalid credentials")
+        
+        user_id = user.get("id", "")
+        if isinstance(user_id, str) and ":" in user_id:
+            user_id = user_id.split(":")[-1]
         else:
-            user_id = user.get("id", "")
-            if isinstance(user_id, str) and ":" in user_id:
-                user_id = user_id.split(":")[-1]
-            else:
-                user_id = str(user_id)
+            user_id = str(user_id)
         
-        token = create_token(f"user:{user_id}", credentials.email)
+        if password_hasher.needs_rehash(user.get("password")):
+            # Upgrade plaintext or outdated hashes now that we know the password
+            new_hash = await password_hasher.hash(credentials.password)
+            await surreal_client.query(f"UPDATE user:{user_id} SET password = '{new_hash}';")
         
-        if isinstance(user, dict):
-            user_response = {k: v for k, v in user.items() if k != "password"}
-        else:
-            user_response = {"id": f"user:{user_id}", "email": credentials.email}
+        token = create_token(f"user:{user_id}", credentials.email)
+        user_response = {k: v for k, v in user.items() if k != "password"}
         
         return {"token": token, "user": user_response}
     except HTTPException:
         raise
+    except HasherBusy as e:
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "1"})
     except Exception as e:
         print(f"Login error: {e}")
         raise HTTPException(status_code=500, detail=f"Login failed: {str(e)}")
@@ -315,6 +470,16 @@ async def create_rating(rating: RatingCreate, current_user: Dict[str, Any] = Dep
     user_id = current_user["id"]
     user_id_clean = user_id.split(":")[-1] if ":" in user_id else user_id
     movie_id_clean = rating.movie_id
+    if not RECORD_KEY_RE.match(user_id_clean) or not RECORD_KEY_RE.match(movie_id_clean):
+        raise HTTPException(status_code=400, detail="Invalid movie or user id")
+    
+    if rating_queue is not None:
+        try:
+            return await rating_queue.submit(user_id_clean, movie_id_clean, rating.score, datetime.utcnow().isoformat())
+        except RatingQueueFull as e:
+            raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "1"})
+        except RatingQueueClosed as e:
+            raise HTTPException(status_code=503, detail=str(e))
     
     existing_ratings = await surreal_client.query(
         f"SELECT id FROM rated WHERE in = 'user:{user_id_clean}' AND out = 'movie:{movie_id_clean}';"
@@ -425,6 +590,22 @@ async def get_my_ratings(current_user: Dict[str, Any] = Depends(get_current_user
                                                 "movie": movie_data if isinstance(movie, dict) else None
                                             }
     
+    if rating_queue is not None:
+        # Read-your-writes: ratings still waiting in the write-behind queue win over stored ones
+        for pending in rating_queue.pending_for_user(user_id_clean):
+            movie_id = f"movie:{pending['movie_id']}"
+            movie_data = movie_ratings.get(movie_id, {}).get("movie")
+            if movie_data is None:
+                movie_obj = await surreal_client.query(f"SELECT * FROM {movie_id};")
+                if movie_obj and isinstance(movie_obj, list) and isinstance(movie_obj[0], dict):
+                    movie_data = movie_obj[0]
+            movie_ratings[movie_id] = {
+                "movie_id": movie_id,
+                "score": pending["score"],
+                "created_at": pending["created_at"],
+                "movie": movie_data
+            }
+    
     result = list(movie_ratings.values())
     return result
 
@@ -619,61 +800,177 @@ async def reload_fixtures() -> Dict[str, str]:
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error loading fixtures: {str(e)}")
 
+async def build_graph_data() -> Dict[str, Any]:
+    users = await surreal_client.query("SELECT id, name, email FROM user;")
+    movies = await surreal_client.query("SELECT id, title, year, director FROM movie;")
+    ratings = await surreal_client.query("SELECT id, in, out, score FROM rated;")
+    
+    users_list = []
+    if users and isinstance(users, list):
+        for user in users:
+            if isinstance(user, dict) and user.get("id"):
+                users_list.append({
+                    "id": user.get("id", ""),
+                    "name": user.get("name", ""),
+                    "email": user.get("email", "")
+                })
+    
+    movies_list = []
+    if movies and isinstance(movies, list):
+        for movie in movies:
+            if isinstance(movie, dict) and movie.get("id"):
+                movies_list.append({
+                    "id": movie.get("id", ""),
+                    "title": movie.get("title", ""),
+                    "year": movie.get("year", None),
+                    "director": movie.get("director", "")
+                })
+    
+    ratings_list = []
+    if ratings and isinstance(ratings, list):
+        for rating in ratings:
+            if isinstance(rating, dict):
+                in_node = rating.get("in", "")
+                out_node = rating.get("out", "")
+                score = rating.get("score", 0)
+                
+                if in_node and out_node and score:
+                    ratings_list.append({
+                        "id": rating.get("id", ""),
+                        "source": in_node,
+                        "target": out_node,
+                        "score": score
+                    })
+    
+    return {
+        "users": users_list,
+        "movies": movies_list,
+        "ratings": ratings_list
+    }
+
 @app.get("/api/graph/data")
-async def get_graph_data() -> Dict[str, Any]:
+async def get_graph_data(accept: Optional[str] = Header(None)) -> Any:
     try:
-        users = await surreal_client.query("SELECT id, name, email FROM user;")
-        movies = await surreal_client.query("SELECT id, title, year, director FROM movie;")
-        ratings = await surreal_client.query("SELECT id, in, out, score FROM rated;")
-        
-        users_list = []
-        if users and isinstance(users, list):
-            for user in users:
-                if isinstance(user, dict) and user.get("id"):
-                    users_list.append({
-                        "id": user.get("id", ""),
-                        "name": user.get("name", ""),
-                        "email": user.get("email", "")
-                    })
-        
-        movies_list = []
-        if movies and isinstance(movies, list):
-            for movie in movies:
-                if isinstance(movie, dict) and movie.get("id"):
-                    movies_list.append({
-                        "id": movie.get("id", ""),
-                        "title": movie.get("title", ""),
-                        "year": movie.get("year", None),
-                        "director": movie.get("director", "")
-                    })
-        
-        ratings_list = []
-        if ratings and isinstance(ratings, list):
-            for rating in ratings:
-                if isinstance(rating, dict):
-                    in_node = rating.get("in", "")
-                    out_node = rating.get("out", "")
-                    score = rating.get("score", 0)
-                    
-                    if in_node and out_node and score:
-                        ratings_list.append({
-                            "id": rating.get("id", ""),
-                            "source": in_node,
-                            "target": out_node,
-                            "score": score
-                        })
-        
-        return {
-            "users": users_list,
-            "movies": movies_list,
-            "ratings": ratings_list
-        }
+        version = change_log.latest_version if change_log is not None else None
+        graph = await build_graph_data()
+        headers = {"Vary": "Accept"}
+        if version is not None:
+            # Lets clients continue with /api/graph/changes?since=<version>
+            headers["X-Graph-Version"] = str(version)
+        if wants_graph_binary(accept):
+            return Response(
+                content=encode_graph_binary(graph),
+                media_type=GRAPH_BINARY_MEDIA_TYPE,
+                headers=headers
+            )
+        return JSONResponse(content=graph, headers=headers)
     except Exception as e:
         print(f"Error fetching graph data: {e}")
         import traceback
         print(traceback.format_exc())
         raise HTTPException(status_code=500, detail=f"Error fetching graph data: {str(e)}")
 
+def changes_since(since: Optional[int]) -> Optional[List[ChangeEvent]]:
+    # None means the client must take a full snapshot: no change log, no version yet,
+    # a version older than the retained history, or more changes than a snapshot costs
+    if change_log is None or since is None:
+        return None
+    events = change_log.changes_since(since)
+    if events is None or len(events) > CHANGE_LOG_MAX_DELTA:
+        return None
+    return events
+
+def delta_version(since: int) -> int:
+    # A worker whose feed lags behind the one that issued `since` keeps the client's version
+    latest = change_log.latest_version if change_log is not None else None
+    return max(since, latest) if latest is not None else since
+
+@app.get("/api/graph/changes")
+async def get_graph_changes(since: Optional[int] = None) -> Dict[str, Any]:
+    try:
+        version = change_log.latest_version if change_log is not None else None
+        events = changes_since(since)
+        if events is None:
+            graph = await build_graph_data()
+            return {"version": version, "full": True, **graph}
+        return {"version": delta_version(since), "full": False, **graph_delta(events)}
+    except Exception as e:
+        print(f"Error fetching graph changes: {e}")
+        import traceback
+        print(traceback.format_exc())
+        raise HTTPException(status_code=500, detail=f"Error fetching graph changes: {str(e)}")
+
+@app.get("/api/movies/changes")
+async def get_movie_changes(since: Optional[int] = None) -> Dict[str, Any]:
+    version = change_log.latest_version if change_log is not None else None
+    events = changes_since(since)
+    if events is None:
+        movies = await get_movies(all=True)
+        return {"version": version, "full": True, "movies": movies}
+    return {"version": delta_version(since), "full": False, **movies_delta(events)}
+
+@app.get("/api/cache/stats")
+async def get_cache_stats(admin: Dict[str, Any] = Depends(get_admin_user)) -> Dict[str, Any]:
+    stats: Dict[str, Any] = {"enabled": query_cache is not None}
+    if query_cache is not None:
+        stats.update(query_cache.stats())
+    if change_feed is not None:
+        stats["change_feed"] = change_feed.stats()
+    return stats
+
+def profile_response(counts: Dict[Any, int], name: str, format: str) -> Response:
+    if format == "collapsed":
+        return PlainTextResponse(
+            to_collapsed(counts),
+            headers={"Content-Disposition": f'attachment; filename="{name}.folded"'}
+        )
+    return JSONResponse(
+        content=to_speedscope(counts, profiler.interval, name),
+        headers={"Content-Disposition": f'attachment; filename="{name}.speedscope.json"'}
+    )
+
+@app.post("/api/admin/profile")
+async def record_profile(seconds: float = 10.0, format: str = "speedscope", admin: Dict[str, Any] = Depends(get_admin_user)) -> Response:
+    if seconds <= 0 or seconds > 120:
+        raise HTTPException(status_code=400, detail="seconds must be between 0 and 120")
+    try:
+        counts = await profiler.profile_for(seconds)
+    except ProfilerBusy as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    return profile_response(counts, f"cinebrain-profile-{datetime.utcnow().strftime('%Y%m%dT%H%M%S')}", format)
+
+@app.get("/api/admin/slow-requests")
+async def list_slow_requests(admin: Dict[str, Any] = Depends(get_admin_user)) -> List[Dict[str, Any]]:
+    return profiler.list_captures()
+
+@app.get("/api/admin/slow-requests/{capture_id}")
+async def get_slow_request(capture_id: int, admin: Dict[str, Any] = Depends(get_admin_user)) -> Dict[str, Any]:
+    capture = profiler.get_capture(capture_id)
+    if capture is None:
+        raise HTTPException(status_code=404, detail="Capture not found")
+    return {k: v for k, v in capture.items() if k != "samples"}
+
+@app.get("/api/admin/slow-requests/{capture_id}/profile")
+async def download_slow_request_profile(capture_id: int, format: str = "speedscope", admin: Dict[str, Any] = Depends(get_admin_user)) -> Response:
+    capture = profiler.get_capture(capture_id)
+    if capture is None:
+        raise HTTPException(status_code=404, detail="Capture not found")
+    return profile_response(capture["samples"], f"cinebrain-slow-request-{capture_id}", format)
+
+@app.post("/api/admin/graph-snapshot")
+async def publish_graph_snapshot(admin: Dict[str, Any] = Depends(get_admin_user)) -> Dict[str, Any]:
+    if snapshot_manager is None:
+        raise HTTPException(status_code=404, detail="GRAPH_SNAPSHOT_DIR is not configured")
+    path = await export_snapshot(surreal_client, snapshot_manager.directory)
+    snapshot_manager.refresh()
+    return {"status": "published", "path": str(path), **snapshot_manager.snapshot.stats()}
+
+@app.get("/api/admin/graph-snapshot")
+async def get_graph_snapshot_info(admin: Dict[str, Any] = Depends(get_admin_user)) -> Dict[str, Any]:
+    if snapshot_manager is None or snapshot_manager.snapshot is None:
+        return {"loaded": False}
+    return {"loaded": True, **snapshot_manager.snapshot.stats()}
+
 @app.get("/api/health")
 async def health_check() -> Dict[str, str]:
     return {"status": "ok"}
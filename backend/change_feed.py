@@ -0,0 +1,253 @@
+import asyncio
+import inspect
+import re
+import time
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+from typing import Any, Awaitable, Callable, Dict, Iterable, List, Optional, Union
+from surreal_client import SurrealClient
+
+WATCHED_TABLES = ("movie", "rated", "belongs_to", "user")
+_CHANGEFEED_RE = re.compile(r"\bCHANGEFEED\s+(\S+)", re.IGNORECASE)
+
+@dataclass
+class ChangeEvent:
+    # action is "create", "update", "delete", "resync" when events may have been
+    # missed and consumers should drop everything they derived from `table`, or
+    # "checkpoint" (table "") once every watched table has been read past `versionstamp`
+    table: str
+    action: str
+    record_id: Optional[str] = None
+    record: Optional[Dict[str, Any]] = None
+    versionstamp: Optional[int] = None
+
+ChangeConsumer = Callable[[ChangeEvent], Union[None, Awaitable[None]]]
+
+class ChangeFeedSubscriber:
+    # Tails SurrealDB change feeds (DEFINE TABLE ... CHANGEFEED) for the watched tables
+    # and dispatches typed events to in-process consumers. Each table keeps its own
+    # versionstamp cursor, so after a dropped connection the next poll resumes exactly
+    # where the last successful one stopped.
+    def __init__(self, client: SurrealClient, tables: Iterable[str] = WATCHED_TABLES, retention: str = "1d", poll_interval: float = 0.25, batch_limit: int = 500, max_backoff: float = 10.0, max_gap: float = 3600.0, replay_window: float = 0.0):
+        self.client = client
+        self.tables = list(tables)
+        self.retention = retention
+        self.poll_interval = poll_interval
+        self.batch_limit = batch_limit
+        self.max_backoff = max_backoff
+        # Outages longer than this may outlive the feed retention; consumers resync
+        self.max_gap = max_gap
+        # On start, replay this many seconds of retained history to consumers
+        self.replay_window = replay_window
+        self._consumers: List[tuple] = []
+        self._cursors: Dict[str, Union[int, str]] = {}
+        self._task: Optional[asyncio.Task] = None
+        self._last_success: Optional[float] = None
+        self._backlogged = False
+        # Last SHOW CHANGES error per table, logged only when it changes
+        self._errors: Dict[str, str] = {}
+        # Highest changeset versionstamp read from any table, and the last checkpoint
+        self._seen: Optional[int] = None
+        self._watermark: Optional[int] = None
+        self.events_dispatched = 0
+
+    def subscribe(self, consumer: ChangeConsumer, tables: Optional[Iterable[str]] = None) -> None:
+        self._consumers.append((set(tables) if tables else None, consumer))
+
+    async def ensure_feeds(self) -> None:
+        # Tables whose feed already has the wanted retention are left alone. Others are
+        # redefined from their current definition so options such as SCHEMAFULL or
+        # PERMISSIONS survive; a bare DEFINE TABLE OVERWRITE would reset them on 2.x.
+        definitions = await self._table_definitions()
+        for table in self.tables:
+            current = definitions.get(table)
+            if current is None:
+                definition = f"DEFINE TABLE {table} CHANGEFEED {self.retention}"
+            else:
+                feed = _CHANGEFEED_RE.search(current)
+                if feed and feed.group(1).lower() == self.retention.lower():
+                    continue
+                definition = self._with_changefeed(current)
+
+            # SurrealDB 1.x redefines existing tables with a plain DEFINE; 2.x rejects
+            # that for existing tables and needs OVERWRITE, which 1.x cannot parse
+            candidates = [definition]
+            if current is not None:
+                candidates.append(re.sub(r"^DEFINE\s+TABLE\s+", "DEFINE TABLE OVERWRITE ", definition, count=1, flags=re.IGNORECASE))
+            for statement in candidates:
+                try:
+                    statuses = await self.client.query_raw(statement + ";", quiet=True)
+                except Exception as e:
+                    print(f"Change feed definition failed ({statement}): {e}")
+                    break
+                errors = [s.get("result") for s in statuses if isinstance(s, dict) and s.get("status") == "ERR"]
+                if not errors:
+                    print(f"Change feed on {table} set to {self.retention}")
+                    break
+                print(f"Change feed definition skipped ({statement}): {errors[0]}")
+
+    async def _table_definitions(self) -> Dict[str, str]:
+        try:
+            statuses = await self.client.query_raw("INFO FOR DB;", quiet=True)
+        except Exception as e:
+            print(f"Could not read table definitions: {e}")
+            return {}
+        for status in reversed(statuses):
+            result = status.get("result") if isinstance(status, dict) else None
+            if isinstance(result, dict):
+                # "tables" on SurrealDB 2.x, "tb" on 1.x
+                tables = result.get("tables", result.get("tb"))
+                if isinstance(tables, dict):
+                    return {name: str(definition) for name, definition in tables.items()}
+        return {}
+
+    def _with_changefeed(self, definition: str) -> str:
+        if _CHANGEFEED_RE.search(definition):
+            return _CHANGEFEED_RE.sub(f"CHANGEFEED {self.retention}", definition, count=1)
+        clause = re.search(r"\s(?:PERMISSIONS|COMMENT)\b", definition, re.IGNORECASE)
+        if clause:
+            return f"{definition[:clause.start()]} CHANGEFEED {self.retention}{definition[clause.start():]}"
+        return f"{definition} CHANGEFEED {self.retention}"
+
+    async def start(self) -> None:
+        if self._task is not None:
+            return
+        await self.ensure_feeds()
+        self._reset_cursors(self.replay_window)
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "running": self._task is not None,
+            "cursors": dict(self._cursors),
+            "watermark": self._watermark,
+            "events_dispatched": self.events_dispatched,
+            "errors": dict(self._errors),
+            "last_success_age": round(time.monotonic() - self._last_success, 3) if self._last_success else None,
+        }
+
+    async def poll_once(self) -> int:
+        # One round trip for all tables, without the client's per-query logging
+        statements = [
+            f"SHOW CHANGES FOR TABLE {table} SINCE {self._cursors[table]} LIMIT {self.batch_limit};"
+            for table in self.tables
+        ]
+        # Everything read before this poll was committed before it started, so once
+        # this poll reads every table to its end, nothing at or below `bound` is unread
+        bound = self._seen
+        statuses = await self.client.query_raw("\n".join(statements), quiet=True)
+        failed = False
+
+        changesets = []
+        # The last len(tables) statuses answer the SHOW statements, after USE
+        for table, status in zip(self.tables, statuses[-len(self.tables):]):
+            if not isinstance(status, dict):
+                continue
+            if status.get("status") == "ERR":
+                error = str(status.get("result"))
+                if self._errors.get(table) != error:
+                    print(f"Change feed read for {table} failed: {error}")
+                self._errors[table] = error
+                failed = True
+                continue
+            self._errors.pop(table, None)
+            result = status.get("result")
+            if isinstance(result, list):
+                changesets.extend((table, changeset) for changeset in result)
+
+        dispatched = 0
+        per_table: Dict[str, int] = {}
+        for table, changeset in changesets:
+            if not isinstance(changeset, dict):
+                continue
+            changes = [c for c in changeset.get("changes", []) or [] if isinstance(c, dict)]
+            per_table[table] = per_table.get(table, 0) + 1
+            versionstamp = changeset.get("versionstamp")
+            for change in changes:
+                event = self._to_event(table, change, versionstamp)
+                if event is not None:
+                    await self._dispatch(event)
+                    dispatched += 1
+            if isinstance(versionstamp, int):
+                self._cursors[table] = versionstamp + 1
+                if self._seen is None or versionstamp > self._seen:
+                    self._seen = versionstamp
+
+        self._backlogged = any(count >= self.batch_limit for count in per_table.values())
+        # Tables advance independently and a backlogged or failed one may still hold
+        # older changes, so only a complete poll moves the checkpoint
+        if not self._backlogged and not failed and bound is not None and (self._watermark is None or bound > self._watermark):
+            self._watermark = bound
+            await self._dispatch(ChangeEvent(table="", action="checkpoint", versionstamp=bound))
+        self._last_success = time.monotonic()
+        return dispatched
+
+    async def _run(self) -> None:
+        backoff = self.poll_interval
+        while True:
+            try:
+                if self._last_success is not None and time.monotonic() - self._last_success > self.max_gap:
+                    print(f"Change feed was unreachable for over {self.max_gap}s, resyncing consumers")
+                    self._reset_cursors()
+                    for table in self.tables:
+                        await self._dispatch(ChangeEvent(table=table, action="resync"))
+                await self.poll_once()
+                backoff = self.poll_interval
+                # A full batch means more is waiting; poll again straight away
+                if not self._backlogged:
+                    await asyncio.sleep(self.poll_interval)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                backoff = min(backoff * 2, self.max_backoff)
+                print(f"Change feed poll failed: {e}. Retrying in {backoff:.2f}s")
+                await asyncio.sleep(backoff)
+
+    def _reset_cursors(self, replay_window: float = 0.0) -> None:
+        since = datetime.now(timezone.utc) - timedelta(seconds=replay_window)
+        for table in self.tables:
+            self._cursors[table] = f'd"{since.strftime("%Y-%m-%dT%H:%M:%S.%fZ")}"'
+        # Changes between the old cursors and `since` are skipped, so earlier
+        # versionstamps no longer bound what has been read
+        self._seen = None
+        self._watermark = None
+        self._last_success = time.monotonic()
+
+    def _to_event(self, table: str, change: Dict[str, Any], versionstamp: Optional[int]) -> Optional[ChangeEvent]:
+        if not isinstance(change, dict):
+            return None
+        for action in ("create", "update", "delete"):
+            if action in change:
+                record = change[action] if isinstance(change[action], dict) else {}
+                return ChangeEvent(
+                    table=table,
+                    action=action,
+                    record_id=record.get("id"),
+                    record=record if action != "delete" else None,
+                    versionstamp=versionstamp
+                )
+        # define_table and other schema entries carry no record changes
+        return None
+
+    async def _dispatch(self, event: ChangeEvent) -> None:
+        if event.action != "checkpoint":
+            self.events_dispatched += 1
+        for tables, consumer in self._consumers:
+            if tables is not None and event.table not in tables:
+                continue
+            try:
+                result = consumer(event)
+                if inspect.isawaitable(result):
+                    await result
+            except Exception as e:
+                print(f"Change feed consumer {consumer} failed on {event}: {e}")
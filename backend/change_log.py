@@ -0,0 +1,99 @@
+from collections import deque
+from typing import Any, Deque, Dict, List, Optional
+from change_feed import ChangeEvent
+
+USER_FIELDS = ("id", "name", "email")
+GRAPH_MOVIE_FIELDS = ("id", "title", "year", "director")
+
+class ChangeLog:
+    # Bounded, versioned history of change feed events. Versions are SurrealDB
+    # versionstamps, which are shared by every worker reading the same database, so a
+    # version handed out by one worker can be resumed from on another. The version
+    # handed out is the subscriber's last checkpoint, not the newest event: tables are
+    # read independently, so a newer event on one table does not mean an older one on
+    # another has arrived yet.
+    def __init__(self, max_events: int = 50000):
+        self.max_events = max_events
+        self._events: Deque[ChangeEvent] = deque()
+        # Last checkpoint: every event at or below it has been recorded
+        self._latest: Optional[int] = None
+        # Oldest version a client may resume from without missing events
+        self._floor: Optional[int] = None
+        self._evicted = False
+
+    @property
+    def latest_version(self) -> Optional[int]:
+        return self._latest
+
+    def record(self, event: ChangeEvent) -> None:
+        if event.action == "resync":
+            self.clear()
+            return
+        if event.versionstamp is None:
+            return
+
+        version = event.versionstamp
+        if not self._evicted and (self._floor is None or version < self._floor):
+            # Everything after a version the subscriber has read is recorded here too
+            self._floor = version
+        if event.action == "checkpoint":
+            if self._latest is None or version > self._latest:
+                self._latest = version
+            return
+
+        self._events.append(event)
+
+        while len(self._events) > self.max_events:
+            evicted = self._events.popleft()
+            self._evicted = True
+            if self._floor is None or evicted.versionstamp > self._floor:
+                self._floor = evicted.versionstamp
+
+    def changes_since(self, version: int) -> Optional[List[ChangeEvent]]:
+        if self._floor is None or version < self._floor:
+            return None
+        return [event for event in self._events if event.versionstamp > version]
+
+    def clear(self) -> None:
+        self._events.clear()
+        self._latest = None
+        self._floor = None
+        self._evicted = False
+
+def _project(record: Optional[Dict[str, Any]], fields) -> Dict[str, Any]:
+    record = record or {}
+    return {field: record.get(field) for field in fields}
+
+def _latest_per_record(events: List[ChangeEvent], tables) -> Dict[str, ChangeEvent]:
+    latest: Dict[str, ChangeEvent] = {}
+    for event in sorted(events, key=lambda e: e.versionstamp):
+        if event.table in tables and event.record_id:
+            latest[event.record_id] = event
+    return latest
+
+def _split(latest: Dict[str, ChangeEvent], shape) -> Dict[str, List[Any]]:
+    upserted = []
+    removed = []
+    for record_id, event in latest.items():
+        item = shape(event.record) if event.action != "delete" else None
+        if item is None:
+            removed.append(record_id)
+        else:
+            upserted.append(item)
+    return {"upserted": upserted, "removed": removed}
+
+def _rating_edge(record: Optional[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+    record = record or {}
+    if not record.get("in") or not record.get("out") or not record.get("score"):
+        return None
+    return {"id": record.get("id"), "source": record["in"], "target": record["out"], "score": record["score"]}
+
+def graph_delta(events: List[ChangeEvent]) -> Dict[str, Any]:
+    return {
+        "users": _split(_latest_per_record(events, {"user"}), lambda r: _project(r, USER_FIELDS)),
+        "movies": _split(_latest_per_record(events, {"movie"}), lambda r: _project(r, GRAPH_MOVIE_FIELDS)),
+        "ratings": _split(_latest_per_record(events, {"rated"}), _rating_edge),
+    }
+
+def movies_delta(events: List[ChangeEvent]) -> Dict[str, Any]:
+    return {"movies": _split(_latest_per_record(events, {"movie"}), lambda r: dict(r or {}))}
@@ -0,0 +1,479 @@
+import argparse
+import asyncio
+import atexit
+import csv
+import json
+import math
+import random
+import re
+import shutil
+import statistics
+import tempfile
+import time
+import tracemalloc
+from collections import Counter, defaultdict
+from dataclasses import dataclass, field
+from itertools import accumulate
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Set, Tuple
+from graph_snapshot import GraphSnapshot, export_snapshot
+
+# Offline evaluation of the recommendation strategies. Ratings are split by time, each
+# strategy sees only the training part, and its top-k list for every user is scored
+# against the movies that user went on to rate highly. Latency and allocation peaks
+# are measured per user so quality and speed changes can be compared side by side.
+#
+#   python evaluate.py                                   # db/fixtures.surql
+#   python evaluate.py --movielens ratings.csv --movies movies.csv
+#   python evaluate.py --synthetic 2000 --movies-count 5000 --json results.json
+
+Recommender = Callable[[str, int], List[str]]
+
+_RELATE_RE = re.compile(r"^RELATE\s+(\w+:\w+)\s*->\s*(\w+)\s*->\s*(\w+:\w+)(?:\s+SET\s+(.*))?$", re.IGNORECASE | re.DOTALL)
+_CREATE_RE = re.compile(r"^CREATE\s+(\w+):(\w+)\s+SET\s+(.*)$", re.IGNORECASE | re.DOTALL)
+_FIELD_RE = re.compile(r"(\w+)\s*=\s*(\"(?:[^\"\\]|\\.)*\"|'(?:[^'\\]|\\.)*'|d\"[^\"]*\"|d'[^']*'|[^,]+)")
+
+@dataclass
+class Rating:
+    user: str
+    movie: str
+    score: float
+    timestamp: float
+
+@dataclass
+class Dataset:
+    name: str
+    ratings: List[Rating]
+    titles: Dict[str, str] = field(default_factory=dict)
+    directors: Dict[str, str] = field(default_factory=dict)
+    movie_genres: Dict[str, Set[str]] = field(default_factory=dict)
+    # False when timestamps are just load order (fixtures use time::now())
+    timed: bool = True
+
+def _parse_fields(clause: str) -> Dict[str, str]:
+    fields = {}
+    for name, value in _FIELD_RE.findall(clause or ""):
+        value = value.strip()
+        if value[:2] in ('d"', "d'"):
+            value = value[1:]
+        if len(value) >= 2 and value[0] == value[-1] and value[0] in "\"'":
+            value = value[1:-1]
+        fields[name] = value
+    return fields
+
+def _parse_time(value: Optional[str]) -> Optional[float]:
+    if not value:
+        return None
+    try:
+        from datetime import datetime
+        return datetime.fromisoformat(value.replace("Z", "+00:00")).timestamp()
+    except ValueError:
+        return None
+
+def load_surql(path: Path) -> Dataset:
+    dataset = Dataset(name=Path(path).name, ratings=[], timed=False)
+    statements = [s.strip() for s in Path(path).read_text(encoding="utf-8").split(";") if s.strip()]
+    timed = 0
+    for position, statement in enumerate(statements):
+        create = _CREATE_RE.match(statement)
+        if create and create.group(1).lower() == "movie":
+            movie_id = f"movie:{create.group(2)}"
+            fields = _parse_fields(create.group(3))
+            dataset.titles[movie_id] = fields.get("title", "")
+            dataset.directors[movie_id] = fields.get("director", "")
+            continue
+
+        relate = _RELATE_RE.match(statement)
+        if not relate:
+            continue
+        source, edge, target, clause = relate.groups()
+        if edge == "belongs_to":
+            dataset.movie_genres.setdefault(source, set()).add(target)
+        elif edge == "rated":
+            fields = _parse_fields(clause)
+            try:
+                score = float(fields["score"])
+            except (KeyError, ValueError):
+                continue
+            timestamp = _parse_time(fields.get("created_at"))
+            if timestamp is not None:
+                timed += 1
+            dataset.ratings.append(Rating(source, target, score, timestamp if timestamp is not None else float(position)))
+    dataset.timed = bool(dataset.ratings) and timed == len(dataset.ratings)
+    return dataset
+
+def load_movielens(ratings_path: Path, movies_path: Optional[Path] = None) -> Dataset:
+    # MovieLens ratings.csv (userId,movieId,rating,timestamp) on a 0.5-5 scale; scores
+    # are doubled to match the app's 1-10 ratings. movies.csv adds titles and genres.
+    dataset = Dataset(name=Path(ratings_path).name, ratings=[])
+    with open(ratings_path, newline="", encoding="utf-8") as f:
+        for row in csv.DictReader(f):
+            dataset.ratings.append(Rating(
+                f"user:u{row['userId']}",
+                f"movie:m{row['movieId']}",
+                float(row["rating"]) * 2,
+                float(row["timestamp"])
+            ))
+    if movies_path:
+        with open(movies_path, newline="", encoding="utf-8") as f:
+            for row in csv.DictReader(f):
+                movie_id = f"movie:m{row['movieId']}"
+                dataset.titles[movie_id] = row.get("title", "")
+                genres = {
+                    "genre:" + re.sub(r"\W+", "_", g.strip().lower()).strip("_")
+                    for g in (row.get("genres") or "").split("|")
+                    if g.strip() and g.strip() != "(no genres listed)"
+                }
+                if genres:
+                    dataset.movie_genres[movie_id] = genres
+    return dataset
+
+def synthetic_dataset(users: int, movies: int, genres: int = 12, ratings_per_user: int = 40, seed: int = 7) -> Dataset:
+    # Users favour a few genres and popular titles, so both content and collaborative
+    # signals exist; scores are higher inside a user's favourite genres.
+    rng = random.Random(seed)
+    dataset = Dataset(name=f"synthetic-{users}x{movies}", ratings=[])
+    genre_ids = [f"genre:g{i}" for i in range(genres)]
+    directors = [f"Director {i}" for i in range(max(1, movies // 4))]
+    movie_ids = [f"movie:m{i}" for i in range(movies)]
+    popularity = [1.0 / (rank + 1) ** 0.8 for rank in range(movies)]
+    for movie_id in movie_ids:
+        dataset.titles[movie_id] = movie_id.split(":")[-1]
+        dataset.directors[movie_id] = rng.choice(directors)
+        dataset.movie_genres[movie_id] = set(rng.sample(genre_ids, rng.randint(1, min(3, genres))))
+
+    for u in range(users):
+        favourites = set(rng.sample(genre_ids, rng.randint(1, min(3, genres))))
+        weights = [p * (4.0 if dataset.movie_genres[m] & favourites else 1.0) for m, p in zip(movie_ids, popularity)]
+        wanted = min(ratings_per_user, movies)
+        draws = rng.choices(movie_ids, cum_weights=list(accumulate(weights)), k=wanted * 3)
+        chosen = list(dict.fromkeys(draws))[:wanted]
+        for movie_id in chosen:
+            liked = bool(dataset.movie_genres[movie_id] & favourites)
+            score = rng.randint(7, 10) if liked else rng.randint(2, 7)
+            # Users are active over the same period, interleaving their ratings
+            dataset.ratings.append(Rating(f"user:u{u}", movie_id, float(score), rng.uniform(0, 1e6)))
+    return dataset
+
+def temporal_split(ratings: List[Rating], test_fraction: float, per_user: bool = True) -> Tuple[List[Rating], List[Rating]]:
+    # per_user holds out each user's most recent ratings, so every user with enough
+    # history is evaluated; the global split uses one cutoff time for everybody, which
+    # also hides other users' later ratings but leaves fewer users to score.
+    ordered = sorted(ratings, key=lambda r: r.timestamp)
+    if not per_user:
+        cutoff = int(len(ordered) * (1 - test_fraction))
+        return ordered[:cutoff], ordered[cutoff:]
+
+    by_user: Dict[str, List[Rating]] = defaultdict(list)
+    for rating in ordered:
+        by_user[rating.user].append(rating)
+    train, test = [], []
+    for user_ratings in by_user.values():
+        cutoff = len(user_ratings) - int(len(user_ratings) * test_fraction)
+        train.extend(user_ratings[:cutoff])
+        test.extend(user_ratings[cutoff:])
+    train.sort(key=lambda r: r.timestamp)
+    return train, test
+
+class TrainIndex:
+    def __init__(self, dataset: Dataset, train: List[Rating]):
+        self.user_ratings: Dict[str, Dict[str, float]] = defaultdict(dict)
+        self.movie_raters: Dict[str, Dict[str, float]] = defaultdict(dict)
+        self.latest: Dict[str, Dict[str, float]] = defaultdict(dict)
+        for rating in train:
+            self.user_ratings[rating.user][rating.movie] = rating.score
+            self.movie_raters[rating.movie][rating.user] = rating.score
+            self.latest[rating.user][rating.movie] = rating.timestamp
+
+        self.directors = dataset.directors
+        self.movie_genres = dataset.movie_genres
+        self.genre_movies: Dict[str, Set[str]] = defaultdict(set)
+        for movie_id, genres in dataset.movie_genres.items():
+            for genre_id in genres:
+                self.genre_movies[genre_id].add(movie_id)
+        self.director_movies: Dict[str, Set[str]] = defaultdict(set)
+        for movie_id, director in dataset.directors.items():
+            if director:
+                self.director_movies[director].add(movie_id)
+        self.popularity = Counter({m: len(raters) for m, raters in self.movie_raters.items()})
+        self.train = train
+        self.dataset = dataset
+
+def _top(scores: Dict[str, float], k: int) -> List[str]:
+    return [m for m, _ in sorted(scores.items(), key=lambda item: (-item[1], item[0]))[:k]]
+
+def build_genre_director(index: TrainIndex) -> Recommender:
+    # Same scoring as /api/recommendations/similar-movies: +1 for every genre of the
+    # user's rated movies a candidate belongs to and +1 for a shared director
+    def recommend(user: str, k: int) -> List[str]:
+        rated = index.user_ratings.get(user, {})
+        genres = {g for m in rated for g in index.movie_genres.get(m, ())}
+        directors = {index.directors[m] for m in rated if index.directors.get(m)}
+        scores: Dict[str, float] = defaultdict(float)
+        for genre_id in genres:
+            for movie_id in index.genre_movies[genre_id]:
+                if movie_id not in rated:
+                    scores[movie_id] += 1
+        for director in directors:
+            for movie_id in index.director_movies[director]:
+                if movie_id not in rated:
+                    scores[movie_id] += 1
+        return _top(scores, k)
+    return recommend
+
+def _seed_movie(index: TrainIndex, user: str) -> Optional[str]:
+    # The similar-users endpoint takes one movie; evaluation seeds it with the user's
+    # best and most recent rating
+    rated = index.user_ratings.get(user, {})
+    if not rated:
+        return None
+    return max(rated, key=lambda m: (rated[m], index.latest[user][m]))
+
+def build_similar_users(index: TrainIndex) -> Recommender:
+    # What /api/recommendations/similar-users returns: the FETCH of
+    # movie<-rated<-user->rated->movie as one flat list, in edge order, unranked and
+    # unfiltered, so it repeats movies several raters share, includes movies the user
+    # already rated, and walks the user's own edges too. Edge order is approximated
+    # by training order.
+    def recommend(user: str, k: int) -> List[str]:
+        seed = _seed_movie(index, user)
+        if seed is None:
+            return []
+        movies: List[str] = []
+        for other in index.movie_raters[seed]:
+            for movie_id in index.user_ratings[other]:
+                movies.append(movie_id)
+                if len(movies) == k:
+                    return movies
+        return movies
+    return recommend
+
+def build_similar_users_ranked(index: TrainIndex) -> Recommender:
+    # The same expansion from the seed movie, with the user's rated movies removed and
+    # candidates ranked by how many of the seed's other raters rated them
+    def recommend(user: str, k: int) -> List[str]:
+        seed = _seed_movie(index, user)
+        if seed is None:
+            return []
+        rated = index.user_ratings[user]
+        scores: Dict[str, float] = defaultdict(float)
+        for other in index.movie_raters[seed]:
+            if other == user:
+                continue
+            for movie_id in index.user_ratings[other]:
+                if movie_id not in rated:
+                    scores[movie_id] += 1
+        return _top(scores, k)
+    return recommend
+
+def build_popularity(index: TrainIndex) -> Recommender:
+    # Baseline every personalised strategy should beat
+    ranked = _top(dict(index.popularity), len(index.popularity))
+    def recommend(user: str, k: int) -> List[str]:
+        rated = index.user_ratings.get(user, {})
+        return [m for m in ranked if m not in rated][:k]
+    return recommend
+
+class _DatasetClient:
+    # Answers the SELECTs export_snapshot issues from the training split, so the
+    # snapshot strategy reads exactly the file the API workers would map
+    def __init__(self, index: TrainIndex):
+        self.index = index
+
+    async def query(self, query: str) -> List[Dict[str, Any]]:
+        index = self.index
+        if "FROM user" in query:
+            return [{"id": u} for u in index.user_ratings]
+        if "FROM movie" in query:
+            movies = set(index.movie_raters) | set(index.directors) | set(index.movie_genres)
+            return [{"id": m, "title": index.dataset.titles.get(m, ""), "director": index.directors.get(m, "")} for m in movies]
+        if "FROM genre" in query:
+            return [{"id": g} for g in index.genre_movies]
+        if "FROM rated" in query:
+            return [{"in": r.user, "out": r.movie, "score": r.score} for r in index.train]
+        if "FROM belongs_to" in query:
+            return [{"in": m, "out": g} for m, genres in index.movie_genres.items() for g in genres]
+        return []
+
+def build_genre_director_snapshot(index: TrainIndex) -> Recommender:
+    # Genre/director scoring served from a memory-mapped graph snapshot
+    directory = Path(tempfile.mkdtemp(prefix="cinebrain-eval-"))
+    atexit.register(shutil.rmtree, directory, True)
+    snapshot = GraphSnapshot(asyncio.run(export_snapshot(_DatasetClient(index), directory, keep=1)))
+    director_movies: Dict[str, List[str]] = defaultdict(list)
+    for row in range(len(snapshot.movie_ids)):
+        if snapshot.movie_directors[row]:
+            director_movies[snapshot.movie_directors[row]].append(snapshot.movie_ids[row])
+
+    def recommend(user: str, k: int) -> List[str]:
+        rated = {m for m, _ in snapshot.user_ratings(user)}
+        genres = {g for m in rated for g in snapshot.movie_genres(m)}
+        directors = {d for d in ((snapshot.movie(m) or {}).get("director") for m in rated) if d}
+        scores: Dict[str, float] = defaultdict(float)
+        for genre_id in genres:
+            for movie_id in snapshot.genre_movies(genre_id):
+                if movie_id not in rated:
+                    scores[movie_id] += 1
+        for director in directors:
+            for movie_id in director_movies[director]:
+                if movie_id not in rated:
+                    scores[movie_id] += 1
+        return _top(scores, k)
+    return recommend
+
+STRATEGIES: Dict[str, Callable[[TrainIndex], Recommender]] = {
+    "genre_director": build_genre_director,
+    "genre_director_snapshot": build_genre_director_snapshot,
+    "similar_users": build_similar_users,
+    "similar_users_ranked": build_similar_users_ranked,
+    "popularity": build_popularity,
+}
+
+def ranking_metrics(recommended: List[str], relevant: Set[str], k: int) -> Tuple[float, float, float]:
+    # A movie repeated in the list only counts the first time it appears
+    seen: Set[str] = set()
+    hits = []
+    for m in recommended[:k]:
+        hits.append(1.0 if m in relevant and m not in seen else 0.0)
+        seen.add(m)
+    dcg = sum(h / math.log2(i + 2) for i, h in enumerate(hits))
+    ideal = sum(1.0 / math.log2(i + 2) for i in range(min(len(relevant), k)))
+    return sum(hits) / k, sum(hits) / len(relevant), dcg / ideal if ideal else 0.0
+
+def _percentile(values: List[float], q: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(q * (len(ordered) - 1))))]
+
+def evaluate_strategy(name: str, dataset: Dataset, train: List[Rating], relevant: Dict[str, Set[str]], k: int, memory_users: int = 100) -> Dict[str, Any]:
+    users = sorted(relevant)
+
+    # Build cost covers the training index as well, since every strategy needs one
+    started = time.perf_counter()
+    index = TrainIndex(dataset, train)
+    recommend = STRATEGIES[name](index)
+    build_seconds = time.perf_counter() - started
+    if users:
+        recommend(users[0], k)
+
+    latencies = []
+    precision, recall, ndcg = [], [], []
+    recommended_movies: Set[str] = set()
+    for user in users:
+        started = time.perf_counter()
+        recommended = recommend(user, k)
+        latencies.append(time.perf_counter() - started)
+        p, r, n = ranking_metrics(recommended, relevant[user], k)
+        precision.append(p)
+        recall.append(r)
+        ndcg.append(n)
+        recommended_movies.update(recommended)
+
+    # Allocation peaks come from a second pass over a sample of users; tracing slows
+    # every allocation down and would skew the timings above
+    tracemalloc.start()
+    recommend = STRATEGIES[name](TrainIndex(dataset, train))
+    build_peak = tracemalloc.get_traced_memory()[1]
+    call_peaks = []
+    for user in users[:memory_users]:
+        tracemalloc.reset_peak()
+        before = tracemalloc.get_traced_memory()[0]
+        recommend(user, k)
+        call_peaks.append(tracemalloc.get_traced_memory()[1] - before)
+    tracemalloc.stop()
+
+    catalogue = len(set(index.movie_raters) | set(index.directors) | set(index.movie_genres))
+    return {
+        "strategy": name,
+        "users": len(users),
+        f"precision@{k}": round(statistics.fmean(precision), 4) if users else 0.0,
+        f"recall@{k}": round(statistics.fmean(recall), 4) if users else 0.0,
+        f"ndcg@{k}": round(statistics.fmean(ndcg), 4) if users else 0.0,
+        "coverage": round(len(recommended_movies) / catalogue, 4) if catalogue else 0.0,
+        "build_ms": round(build_seconds * 1000, 2),
+        "latency_mean_ms": round(statistics.fmean(latencies) * 1000, 3) if users else 0.0,
+        "latency_p50_ms": round(_percentile(latencies, 0.5) * 1000, 3) if users else 0.0,
+        "latency_p95_ms": round(_percentile(latencies, 0.95) * 1000, 3) if users else 0.0,
+        "latency_p99_ms": round(_percentile(latencies, 0.99) * 1000, 3) if users else 0.0,
+        "build_peak_kb": round(build_peak / 1024, 1),
+        "call_peak_kb_p95": round(_percentile(call_peaks, 0.95) / 1024, 1) if call_peaks else 0.0,
+    }
+
+def run(dataset: Dataset, strategies: List[str], k: int, test_fraction: float, per_user: bool, relevant_score: float, max_users: Optional[int], memory_users: int, seed: int) -> Dict[str, Any]:
+    train, test = temporal_split(dataset.ratings, test_fraction, per_user)
+    index = TrainIndex(dataset, train)
+
+    # Users need some history to be recommended for and at least one liked held-out
+    # movie they had not already rated before the cutoff
+    relevant: Dict[str, Set[str]] = defaultdict(set)
+    for rating in test:
+        if rating.score >= relevant_score and rating.user in index.user_ratings and rating.movie not in index.user_ratings[rating.user]:
+            relevant[rating.user].add(rating.movie)
+    if max_users is not None and len(relevant) > max_users:
+        sampled = random.Random(seed).sample(sorted(relevant), max_users)
+        relevant = {u: relevant[u] for u in sampled}
+
+    return {
+        "dataset": dataset.name,
+        "ratings": len(dataset.ratings),
+        "train": len(train),
+        "test": len(test),
+        "timed": dataset.timed,
+        "split": "per-user" if per_user else "global",
+        "k": k,
+        "relevant_score": relevant_score,
+        "results": [evaluate_strategy(name, dataset, train, relevant, k, memory_users) for name in strategies],
+    }
+
+def print_report(report: Dict[str, Any]) -> None:
+    k = report["k"]
+    print(f"Dataset {report['dataset']}: {report['ratings']} ratings, {report['train']} train / {report['test']} test ({report['split']} split)")
+    if not report["timed"]:
+        print("Ratings carry no timestamps; the split follows load order")
+    columns = ["strategy", "users", f"precision@{k}", f"recall@{k}", f"ndcg@{k}", "coverage",
+               "latency_p50_ms", "latency_p95_ms", "call_peak_kb_p95", "build_ms", "build_peak_kb"]
+    rows = [[str(result[c]) for c in columns] for result in report["results"]]
+    widths = [max(len(c), *(len(r[i]) for r in rows)) if rows else len(c) for i, c in enumerate(columns)]
+    print("  ".join(c.ljust(w) for c, w in zip(columns, widths)))
+    for row in rows:
+        print("  ".join(v.ljust(w) for v, w in zip(row, widths)))
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Compare recommendation quality and latency offline")
+    source = parser.add_mutually_exclusive_group()
+    source.add_argument("--fixtures", type=Path, default=Path(__file__).parent.parent / "db" / "fixtures.surql", help="SurrealQL fixtures file (default)")
+    source.add_argument("--movielens", type=Path, help="MovieLens ratings.csv")
+    source.add_argument("--synthetic", type=int, metavar="USERS", help="Generate a synthetic dataset with this many users")
+    parser.add_argument("--movies", type=Path, help="MovieLens movies.csv for genres")
+    parser.add_argument("--movies-count", type=int, default=1000, help="Movies in the synthetic dataset")
+    parser.add_argument("--ratings-per-user", type=int, default=40, help="Ratings per synthetic user")
+    parser.add_argument("--strategies", default=",".join(STRATEGIES), help="Comma-separated strategies to run")
+    parser.add_argument("-k", type=int, default=10, help="Recommendation list length; the API returns 10")
+    parser.add_argument("--test-fraction", type=float, default=0.2, help="Most recent share of ratings held out")
+    parser.add_argument("--split", choices=["per-user", "global"], default="per-user", help="Hold out each user's latest ratings or everything after one cutoff")
+    parser.add_argument("--relevant-score", type=float, default=7, help="Held-out ratings at or above this count as hits (1-10 scale)")
+    parser.add_argument("--max-users", type=int, help="Evaluate a random sample of this many users")
+    parser.add_argument("--memory-users", type=int, default=100, help="Users traced with tracemalloc for allocation peaks")
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--json", type=Path, help="Also write the report to this file")
+    args = parser.parse_args()
+
+    strategies = [s.strip() for s in args.strategies.split(",") if s.strip()]
+    unknown = [s for s in strategies if s not in STRATEGIES]
+    if unknown:
+        parser.error(f"unknown strategies: {', '.join(unknown)} (available: {', '.join(STRATEGIES)})")
+
+    if args.movielens:
+        dataset = load_movielens(args.movielens, args.movies)
+    elif args.synthetic:
+        dataset = synthetic_dataset(args.synthetic, args.movies_count, ratings_per_user=args.ratings_per_user, seed=args.seed)
+    else:
+        dataset = load_surql(args.fixtures)
+
+    report = run(dataset, strategies, args.k, args.test_fraction, args.split == "per-user", args.relevant_score, args.max_users, args.memory_users, args.seed)
+    print_report(report)
+    if args.json:
+        args.json.write_text(json.dumps(report, indent=2))
+        print(f"Wrote {args.json}")
+
+if __name__ == "__main__":
+    main()
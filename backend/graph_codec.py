@@ -0,0 +1,103 @@
+import json
+import struct
+import sys
+from array import array
+from typing import Any, Dict, List, Tuple
+
+GRAPH_BINARY_MEDIA_TYPE = "application/vnd.cinebrain.graph+binary"
+GRAPH_BINARY_MAGIC = b"CBG1"
+
+# Layout (all integers little-endian):
+#   magic "CBG1" | uint32 header length | UTF-8 JSON header | zero padding to 4 bytes
+#   | uint32 source[edge_count] | uint32 target[edge_count] | uint8 score[edge_count]
+#
+# The header is the node dictionary in columnar form. Node indices are positions in
+# users followed by movies, so edges never repeat node id strings. Edge record ids
+# are left out; there is one rating per user and movie, so clients match edges by
+# their endpoints when applying deltas.
+
+def _accept_quality(ranges: List[Tuple[str, float]], media_type: str) -> float:
+    # The most specific matching range decides, as in RFC 9110
+    main_type = media_type.split("/", 1)[0]
+    for candidate in (media_type, f"{main_type}/*", "*/*"):
+        for name, quality in ranges:
+            if name == candidate:
+                return quality
+    return 0.0
+
+def wants_graph_binary(accept: str) -> bool:
+    # Binary only when the client names it explicitly, does not refuse it with q=0
+    # and does not rank JSON above it
+    ranges = []
+    for part in (accept or "").split(","):
+        params = [p.strip() for p in part.split(";")]
+        name = params[0].lower()
+        if not name:
+            continue
+        quality = 1.0
+        for param in params[1:]:
+            key, _, value = param.partition("=")
+            if key.strip().lower() == "q":
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        ranges.append((name, quality))
+
+    if not any(name == GRAPH_BINARY_MEDIA_TYPE for name, _ in ranges):
+        return False
+    binary = _accept_quality(ranges, GRAPH_BINARY_MEDIA_TYPE)
+    return binary > 0 and binary >= _accept_quality(ranges, "application/json")
+
+def encode_graph_binary(graph: Dict[str, List[Dict[str, Any]]]) -> bytes:
+    users = graph.get("users", [])
+    movies = graph.get("movies", [])
+
+    node_index: Dict[str, int] = {}
+    for user in users:
+        node_index[user["id"]] = len(node_index)
+    for movie in movies:
+        node_index[movie["id"]] = len(node_index)
+
+    sources = array("I")
+    targets = array("I")
+    scores = array("B")
+    for rating in graph.get("ratings", []):
+        source = node_index.get(rating["source"])
+        target = node_index.get(rating["target"])
+        if source is None or target is None:
+            continue
+        sources.append(source)
+        targets.append(target)
+        scores.append(max(0, min(255, int(round(rating["score"])))))
+
+    header = {
+        "users": {
+            "ids": [u["id"] for u in users],
+            "names": [u.get("name", "") for u in users],
+            "emails": [u.get("email", "") for u in users],
+        },
+        "movies": {
+            "ids": [m["id"] for m in movies],
+            "titles": [m.get("title", "") for m in movies],
+            "years": [m.get("year") for m in movies],
+            "directors": [m.get("director", "") for m in movies],
+        },
+        "edge_count": len(sources),
+    }
+    header_bytes = json.dumps(header, separators=(",", ":"), default=str).encode("utf-8")
+    padding = (-(8 + len(header_bytes))) % 4
+
+    if sys.byteorder != "little":
+        sources.byteswap()
+        targets.byteswap()
+
+    return b"".join([
+        GRAPH_BINARY_MAGIC,
+        struct.pack("<I", len(header_bytes)),
+        header_bytes,
+        b"\x00" * padding,
+        sources.tobytes(),
+        targets.tobytes(),
+        scores.tobytes(),
+    ])
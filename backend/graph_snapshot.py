@@ -0,0 +1,396 @@
+import asyncio
+import fcntl
+import json
+import mmap
+import os
+import secrets
+import struct
+import sys
+import time
+from array import array
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+from surreal_client import SurrealClient
+
+SNAPSHOT_MAGIC = b"CBSNAP01"
+POINTER_FILE = "CURRENT"
+LOCK_FILE = ".lock"
+_PREAMBLE = struct.Struct("<8sQQ")
+
+# File layout (little-endian):
+#   preamble: magic, uint64 header offset, uint64 header length
+#   8-byte aligned sections: typed arrays and string tables
+#   JSON header describing every section (offset, byte length, array typecode)
+#
+# Graph adjacency is stored as CSR: for row i, indices[indptr[i]:indptr[i + 1]] are
+# its neighbours. Id string tables are sorted so lookups bisect the mapped bytes.
+
+class StringTable:
+    def __init__(self, offsets: memoryview, data: memoryview):
+        self._offsets = offsets
+        self._data = data
+
+    def __len__(self) -> int:
+        return len(self._offsets) - 1
+
+    def __getitem__(self, i: int) -> str:
+        return bytes(self._data[self._offsets[i]:self._offsets[i + 1]]).decode("utf-8")
+
+    def index(self, value: str) -> Optional[int]:
+        # Only valid for sorted tables (record ids)
+        target = value.encode("utf-8")
+        lo, hi = 0, len(self)
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if bytes(self._data[self._offsets[mid]:self._offsets[mid + 1]]) < target:
+                lo = mid + 1
+            else:
+                hi = mid
+        if lo < len(self) and self[lo] == value:
+            return lo
+        return None
+
+class GraphSnapshot:
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self._file = open(self.path, "rb")
+        self._mm = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, header_offset, header_length = _PREAMBLE.unpack_from(self._mm, 0)
+        if magic != SNAPSHOT_MAGIC:
+            raise ValueError(f"{self.path} is not a graph snapshot")
+        self.header = json.loads(bytes(self._mm[header_offset:header_offset + header_length]))
+        if self.header.get("byteorder", "little") != sys.byteorder:
+            raise ValueError(f"{self.path} was written for {self.header['byteorder']}-endian hosts")
+
+        self.version = self.header["version"]
+        view = memoryview(self._mm)
+        self._views: Dict[str, memoryview] = {}
+        for name, section in self.header["sections"].items():
+            raw = view[section["offset"]:section["offset"] + section["length"]]
+            self._views[name] = raw.cast(section["typecode"]) if section["typecode"] != "bytes" else raw
+
+        self.user_ids = self._strings("user_ids")
+        self.movie_ids = self._strings("movie_ids")
+        self.genre_ids = self._strings("genre_ids")
+        self.movie_titles = self._strings("movie_titles")
+        self.movie_directors = self._strings("movie_directors")
+        self.genre_names = self._strings("genre_names")
+
+    def user_ratings(self, user_id: str) -> List[Tuple[str, int]]:
+        row = self.user_ids.index(user_id)
+        if row is None:
+            return []
+        return [(self.movie_ids[m], s) for m, s in self._row("user_movies", row, "user_movie_scores")]
+
+    def movie_ratings(self, movie_id: str) -> List[Tuple[str, int]]:
+        row = self.movie_ids.index(movie_id)
+        if row is None:
+            return []
+        return [(self.user_ids[u], s) for u, s in self._row("movie_users", row, "movie_user_scores")]
+
+    def movie_genres(self, movie_id: str) -> List[str]:
+        row = self.movie_ids.index(movie_id)
+        if row is None:
+            return []
+        return [self.genre_ids[g] for g, _ in self._row("movie_genres", row)]
+
+    def genre_movies(self, genre_id: str) -> List[str]:
+        row = self.genre_ids.index(genre_id)
+        if row is None:
+            return []
+        return [self.movie_ids[m] for m, _ in self._row("genre_movies", row)]
+
+    def movie(self, movie_id: str) -> Optional[Dict[str, Any]]:
+        row = self.movie_ids.index(movie_id)
+        if row is None:
+            return None
+        year = self._views["movie_years"][row]
+        return {
+            "id": movie_id,
+            "title": self.movie_titles[row],
+            "year": year if year >= 0 else None,
+            "director": self.movie_directors[row],
+        }
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "version": self.version,
+            "path": str(self.path),
+            "bytes": len(self._mm),
+            "users": len(self.user_ids),
+            "movies": len(self.movie_ids),
+            "genres": len(self.genre_ids),
+            "ratings": len(self._views["user_movies_indices"]),
+            "genre_links": len(self._views["movie_genres_indices"]),
+        }
+
+    def close(self) -> None:
+        self.user_ids = self.movie_ids = self.genre_ids = None
+        self.movie_titles = self.movie_directors = self.genre_names = None
+        for view in self._views.values():
+            view.release()
+        self._views.clear()
+        self._mm.close()
+        self._file.close()
+
+    def _strings(self, name: str) -> StringTable:
+        return StringTable(self._views[f"{name}_offsets"], self._views[f"{name}_data"])
+
+    def _row(self, name: str, row: int, values: Optional[str] = None):
+        indptr = self._views[f"{name}_indptr"]
+        start, end = indptr[row], indptr[row + 1]
+        indices = self._views[f"{name}_indices"][start:end]
+        if values is None:
+            return [(i, None) for i in indices]
+        return list(zip(indices, self._views[values][start:end]))
+
+class _SnapshotWriter:
+    def __init__(self):
+        self._chunks: List[bytes] = []
+        self._offset = _PREAMBLE.size
+        self.sections: Dict[str, Dict[str, Any]] = {}
+
+    def add_array(self, name: str, values: array) -> None:
+        if sys.byteorder != "little" and values.itemsize > 1:
+            values = array(values.typecode, values)
+            values.byteswap()
+        self._add(name, values.tobytes(), values.typecode)
+
+    def add_strings(self, name: str, strings: List[str]) -> None:
+        offsets = array("I", [0])
+        data = bytearray()
+        for value in strings:
+            data += (value or "").encode("utf-8")
+            offsets.append(len(data))
+        self.add_array(f"{name}_offsets", offsets)
+        self._add(f"{name}_data", bytes(data), "bytes")
+
+    def add_csr(self, name: str, rows: int, pairs: List[Tuple[int, int, int]], values: Optional[str] = None) -> None:
+        # pairs are (row, column, value); sorting groups each row's neighbours together
+        pairs = sorted(pairs)
+        indptr = array("I", [0] * (rows + 1))
+        for row, _, _ in pairs:
+            indptr[row + 1] += 1
+        for i in range(rows):
+            indptr[i + 1] += indptr[i]
+        self.add_array(f"{name}_indptr", indptr)
+        self.add_array(f"{name}_indices", array("I", [column for _, column, _ in pairs]))
+        if values is not None:
+            self.add_array(values, array("B", [value for _, _, value in pairs]))
+
+    def write(self, path: Path, version: int) -> None:
+        header = json.dumps({
+            "version": version,
+            "created_at": time.time(),
+            "byteorder": "little",
+            "sections": self.sections,
+        }).encode("utf-8")
+        with open(path, "wb") as f:
+            f.write(_PREAMBLE.pack(SNAPSHOT_MAGIC, self._offset, len(header)))
+            for chunk in self._chunks:
+                f.write(chunk)
+            f.write(header)
+            f.flush()
+            os.fsync(f.fileno())
+
+    def _add(self, name: str, data: bytes, typecode: str) -> None:
+        padding = (-self._offset) % 8
+        if padding:
+            self._chunks.append(b"\x00" * padding)
+            self._offset += padding
+        self.sections[name] = {"offset": self._offset, "length": len(data), "typecode": typecode}
+        self._chunks.append(data)
+        self._offset += len(data)
+
+def _record_id(value: Any) -> str:
+    return value if isinstance(value, str) else str(value or "")
+
+async def export_snapshot(client: SurrealClient, directory: Path, keep: int = 3) -> Path:
+    directory = Path(directory)
+    directory.mkdir(parents=True, exist_ok=True)
+
+    users = await client.query("SELECT id FROM user;")
+    movies = await client.query("SELECT id, title, year, director FROM movie;")
+    genres = await client.query("SELECT id, name FROM genre;")
+    ratings = await client.query("SELECT in, out, score FROM rated;")
+    memberships = await client.query("SELECT in, out FROM belongs_to;")
+
+    # Building and fsyncing a large snapshot takes long enough to stall every request
+    # on the event loop, so everything after the queries runs in a worker thread
+    return await asyncio.to_thread(_write_snapshot, directory, keep, users, movies, genres, ratings, memberships)
+
+def _write_snapshot(directory: Path, keep: int, users: List[Any], movies: List[Any], genres: List[Any], ratings: List[Any], memberships: List[Any]) -> Path:
+    user_ids = sorted({_record_id(u.get("id")) for u in users if isinstance(u, dict) and u.get("id")})
+    movie_rows = {_record_id(m.get("id")): m for m in movies if isinstance(m, dict) and m.get("id")}
+    movie_ids = sorted(movie_rows)
+    genre_rows = {_record_id(g.get("id")): g for g in genres if isinstance(g, dict) and g.get("id")}
+    genre_ids = sorted(genre_rows)
+
+    user_index = {u: i for i, u in enumerate(user_ids)}
+    movie_index = {m: i for i, m in enumerate(movie_ids)}
+    genre_index = {g: i for i, g in enumerate(genre_ids)}
+
+    # The last rating wins when a user rated the same movie more than once
+    rated: Dict[Tuple[int, int], int] = {}
+    for rating in ratings:
+        if not isinstance(rating, dict):
+            continue
+        u = user_index.get(_record_id(rating.get("in")))
+        m = movie_index.get(_record_id(rating.get("out")))
+        score = rating.get("score")
+        if u is None or m is None or not isinstance(score, (int, float)):
+            continue
+        rated[(u, m)] = max(0, min(255, int(round(score))))
+
+    links = set()
+    for membership in memberships:
+        if not isinstance(membership, dict):
+            continue
+        m = movie_index.get(_record_id(membership.get("in")))
+        g = genre_index.get(_record_id(membership.get("out")))
+        if m is not None and g is not None:
+            links.add((m, g))
+
+    writer = _SnapshotWriter()
+    writer.add_strings("user_ids", user_ids)
+    writer.add_strings("movie_ids", movie_ids)
+    writer.add_strings("genre_ids", genre_ids)
+    writer.add_strings("movie_titles", [movie_rows[m].get("title") or "" for m in movie_ids])
+    writer.add_strings("movie_directors", [movie_rows[m].get("director") or "" for m in movie_ids])
+    writer.add_strings("genre_names", [genre_rows[g].get("name") or "" for g in genre_ids])
+    writer.add_array("movie_years", array("i", [movie_rows[m].get("year") if isinstance(movie_rows[m].get("year"), int) else -1 for m in movie_ids]))
+    writer.add_csr("user_movies", len(user_ids), [(u, m, s) for (u, m), s in rated.items()], "user_movie_scores")
+    writer.add_csr("movie_users", len(movie_ids), [(m, u, s) for (u, m), s in rated.items()], "movie_user_scores")
+    writer.add_csr("movie_genres", len(movie_ids), [(m, g, 0) for m, g in links])
+    writer.add_csr("genre_movies", len(genre_ids), [(g, m, 0) for m, g in links])
+
+    version = _reserve_version(directory)
+    final_path = directory / f"graph-{version}.snap"
+    # Unique per writer, so concurrent exports never share a temp file
+    tmp_path = directory / f".graph-{version}.{os.getpid()}.{secrets.token_hex(4)}.snap.tmp"
+    try:
+        writer.write(tmp_path, version)
+        os.replace(tmp_path, final_path)
+    except BaseException:
+        for path in (tmp_path, final_path):
+            try:
+                path.unlink()
+            except OSError:
+                pass
+        raise
+
+    with _directory_lock(directory):
+        # A concurrent export may already have published a newer version
+        if version > _current_version(directory):
+            _publish(directory, final_path.name)
+        _prune(directory, keep)
+    print(f"Published graph snapshot {final_path} ({len(user_ids)} users, {len(movie_ids)} movies, {len(rated)} ratings)")
+    return final_path
+
+def _reserve_version(directory: Path) -> int:
+    # Creating the final file exclusively claims its version; a concurrent export that
+    # picked the same millisecond moves on to the next one
+    version = max(int(time.time() * 1000), _current_version(directory) + 1)
+    while True:
+        try:
+            fd = os.open(directory / f"graph-{version}.snap", os.O_CREAT | os.O_EXCL | os.O_WRONLY, 0o644)
+        except FileExistsError:
+            version += 1
+            continue
+        os.close(fd)
+        return version
+
+class _directory_lock:
+    # Serialises publishing and pruning between exporting processes
+    def __init__(self, directory: Path):
+        self.path = directory / LOCK_FILE
+
+    def __enter__(self) -> None:
+        self._file = open(self.path, "a")
+        fcntl.flock(self._file.fileno(), fcntl.LOCK_EX)
+
+    def __exit__(self, *exc) -> None:
+        fcntl.flock(self._file.fileno(), fcntl.LOCK_UN)
+        self._file.close()
+
+def _snapshot_version(path: Path) -> int:
+    try:
+        return int(path.name[len("graph-"):-len(".snap")])
+    except ValueError:
+        return -1
+
+def _current_version(directory: Path) -> int:
+    pointer = directory / POINTER_FILE
+    try:
+        name = pointer.read_text().strip()
+        return int(name[len("graph-"):-len(".snap")])
+    except (OSError, ValueError):
+        return 0
+
+def _publish(directory: Path, filename: str) -> None:
+    tmp_pointer = directory / f".{POINTER_FILE}.tmp"
+    with open(tmp_pointer, "w") as f:
+        f.write(filename)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_pointer, directory / POINTER_FILE)
+
+def _prune(directory: Path, keep: int) -> None:
+    # Workers still mapping an older file keep it alive; unlinking only drops the name.
+    # Files newer than the published one belong to exports still in flight.
+    current = _current_version(directory)
+    published = [p for p in directory.glob("graph-*.snap") if 0 <= _snapshot_version(p) <= current]
+    snapshots = sorted(published, key=_snapshot_version, reverse=True)
+    for old in snapshots[max(keep, 1):]:
+        try:
+            old.unlink()
+        except OSError as e:
+            print(f"Could not remove old snapshot {old}: {e}")
+
+class SnapshotManager:
+    # Holds the snapshot a worker currently serves from. refresh() follows the CURRENT
+    # pointer and swaps in a newer file; readers that grabbed the previous snapshot keep
+    # a valid mapping until they drop their reference.
+    def __init__(self, directory: Path):
+        self.directory = Path(directory)
+        self.snapshot: Optional[GraphSnapshot] = None
+        self._pointer: Optional[str] = None
+
+    def refresh(self) -> bool:
+        try:
+            name = (self.directory / POINTER_FILE).read_text().strip()
+        except OSError:
+            return False
+        if not name or name == self._pointer:
+            return False
+        try:
+            snapshot = GraphSnapshot(self.directory / name)
+        except (OSError, ValueError) as e:
+            print(f"Could not load graph snapshot {name}: {e}")
+            return False
+        self.snapshot = snapshot
+        self._pointer = name
+        print(f"Loaded graph snapshot version {snapshot.version}")
+        return True
+
+    async def watch(self, interval: float = 5.0) -> None:
+        while True:
+            self.refresh()
+            await asyncio.sleep(interval)
+
+async def main() -> None:
+    client = SurrealClient(
+        url=os.getenv("SURREAL_URL", "http://surrealdb:8000"),
+        user=os.getenv("SURREAL_USER", "root"),
+        password=os.getenv("SURREAL_PASS", "root"),
+        namespace=os.getenv("SURREAL_NS", "test"),
+        database=os.getenv("SURREAL_DB", "test")
+    )
+    try:
+        await client.connect()
+        await export_snapshot(client, Path(os.getenv("GRAPH_SNAPSHOT_DIR", "snapshots")))
+    finally:
+        await client.close()
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,129 @@
+import asyncio
+import base64
+import hashlib
+import hmac
+import os
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Deque, Dict, Optional
+
+HASH_SCHEME = "scrypt"
+
+class HasherBusy(Exception):
+    pass
+
+class PasswordHasher:
+    # scrypt is memory-hard and takes tens of milliseconds per call, so hashing runs on a
+    # small thread pool (hashlib releases the GIL while deriving) and the number of
+    # in-flight derivations is capped so login storms cannot queue up unbounded work.
+    def __init__(self, n: int = 2 ** 14, r: int = 8, p: int = 1, max_workers: int = 2, max_pending: int = 16, acquire_timeout: float = 2.0):
+        self.n = n
+        self.r = r
+        self.p = p
+        self.max_pending = max_pending
+        self.acquire_timeout = acquire_timeout
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="password-hasher")
+        self._slots: Optional[asyncio.Semaphore] = None
+        # Verified against when the user does not exist, so both paths cost the same
+        self._dummy_hash = self._hash_sync("not-a-real-password")
+
+    async def hash(self, password: str) -> str:
+        return await self._run(self._hash_sync, password)
+
+    async def verify(self, password: str, stored: Optional[str]) -> bool:
+        if not stored:
+            await self._run(self._verify_sync, password, self._dummy_hash)
+            return False
+        return await self._run(self._verify_sync, password, stored)
+
+    def is_hashed(self, stored: Optional[str]) -> bool:
+        return isinstance(stored, str) and stored.startswith(f"{HASH_SCHEME}$")
+
+    def needs_rehash(self, stored: Optional[str]) -> bool:
+        if not self.is_hashed(stored):
+            return True
+        try:
+            _, n, r, p, _, _ = stored.split("$")
+            return (int(n), int(r), int(p)) != (self.n, self.r, self.p)
+        except ValueError:
+            # Malformed value; verify() rejects it, so this only matters after a reset
+            return True
+
+    def shutdown(self) -> None:
+        self._executor.shutdown(wait=True)
+
+    async def _run(self, func, *args):
+        if self._slots is None:
+            self._slots = asyncio.Semaphore(self.max_pending)
+        try:
+            await asyncio.wait_for(self._slots.acquire(), timeout=self.acquire_timeout)
+        except asyncio.TimeoutError:
+            raise HasherBusy("Too many concurrent password checks")
+        try:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self._executor, func, *args)
+        finally:
+            self._slots.release()
+
+    def _derive(self, password: str, salt: bytes, n: int, r: int, p: int) -> bytes:
+        return hashlib.scrypt(password.encode("utf-8"), salt=salt, n=n, r=r, p=p, maxmem=256 * n * r * p, dklen=32)
+
+    def _hash_sync(self, password: str) -> str:
+        salt = os.urandom(16)
+        digest = self._derive(password, salt, self.n, self.r, self.p)
+        return "$".join([
+            HASH_SCHEME,
+            str(self.n),
+            str(self.r),
+            str(self.p),
+            base64.b64encode(salt).decode("ascii"),
+            base64.b64encode(digest).decode("ascii"),
+        ])
+
+    def _verify_sync(self, password: str, stored: str) -> bool:
+        if not self.is_hashed(stored):
+            # Legacy plaintext value (fixtures); the caller upgrades it after a match
+            return hmac.compare_digest(password.encode("utf-8"), stored.encode("utf-8"))
+        try:
+            _, n, r, p, salt_b64, digest_b64 = stored.split("$")
+            salt = base64.b64decode(salt_b64)
+            expected = base64.b64decode(digest_b64)
+            digest = self._derive(password, salt, int(n), int(r), int(p))
+        except (ValueError, TypeError, OverflowError, MemoryError):
+            return False
+        return hmac.compare_digest(digest, expected)
+
+class LoginThrottle:
+    # Sliding window of failed login attempts per client IP. Failures only age out of
+    # the window; a successful login does not clear them.
+    def __init__(self, max_attempts: int = 10, window: float = 300.0, max_tracked: int = 10000):
+        self.max_attempts = max_attempts
+        self.window = window
+        self.max_tracked = max_tracked
+        self._failures: Dict[str, Deque[float]] = {}
+
+    def retry_after(self, key: str) -> Optional[int]:
+        attempts = self._prune(key)
+        if len(attempts) < self.max_attempts:
+            return None
+        return max(1, int(attempts[0] + self.window - time.monotonic()) + 1)
+
+    def record_failure(self, key: str) -> None:
+        if len(self._failures) >= self.max_tracked:
+            for tracked in list(self._failures):
+                self._prune(tracked)
+        self._prune(key)
+        self._failures.setdefault(key, deque()).append(time.monotonic())
+
+    def _prune(self, key: str) -> Deque[float]:
+        attempts = self._failures.get(key)
+        if attempts is None:
+            return deque()
+        cutoff = time.monotonic() - self.window
+        while attempts and attempts[0] < cutoff:
+            attempts.popleft()
+        if not attempts:
+            # Keep the map from growing with one-off addresses
+            del self._failures[key]
+        return attempts
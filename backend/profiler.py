@@ -0,0 +1,205 @@
+import asyncio
+import contextvars
+import sys
+import threading
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from datetime import datetime
+from typing import Any, Deque, Dict, List, Optional, Tuple
+
+Frame = Tuple[str, str, int]
+Stack = Tuple[Frame, ...]
+
+# Queries issued while handling the current request, filled only while it is tracked
+_request_queries: contextvars.ContextVar[Optional[List[Dict[str, Any]]]] = contextvars.ContextVar("request_queries", default=None)
+
+class StackSampler:
+    # Periodically snapshots one thread's Python stack from a background thread and
+    # counts identical stacks. Nothing runs unless start() has been called.
+    def __init__(self, thread_id: int, interval: float = 0.005):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.counts: Dict[Stack, int] = {}
+        self.started_at: Optional[float] = None
+        self.stopped_at: Optional[float] = None
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> None:
+        self.started_at = time.perf_counter()
+        self._thread = threading.Thread(target=self._run, name="stack-sampler", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> Dict[Stack, int]:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+        self.stopped_at = time.perf_counter()
+        return self.counts
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is None:
+                continue
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append((code.co_name, code.co_filename, code.co_firstlineno))
+                frame = frame.f_back
+            key = tuple(reversed(stack))
+            self.counts[key] = self.counts.get(key, 0) + 1
+
+def to_speedscope(counts: Dict[Stack, int], interval: float, name: str) -> Dict[str, Any]:
+    frame_index: Dict[Frame, int] = {}
+    frames = []
+    samples = []
+    weights = []
+    for stack, count in counts.items():
+        sample = []
+        for frame in stack:
+            if frame not in frame_index:
+                frame_index[frame] = len(frames)
+                frames.append({"name": frame[0], "file": frame[1], "line": frame[2]})
+            sample.append(frame_index[frame])
+        samples.append(sample)
+        weights.append(count * interval)
+    total = sum(weights)
+    return {
+        "$schema": "https://www.speedscope.app/file-format-schema.json",
+        "shared": {"frames": frames},
+        "profiles": [{
+            "type": "sampled",
+            "name": name,
+            "unit": "seconds",
+            "startValue": 0,
+            "endValue": total,
+            "samples": samples,
+            "weights": weights,
+        }],
+        "name": name,
+        "exporter": "cinebrain",
+    }
+
+def to_collapsed(counts: Dict[Stack, int]) -> str:
+    # Brendan Gregg's folded format, readable by flamegraph.pl and speedscope
+    lines = []
+    for stack, count in sorted(counts.items(), key=lambda item: -item[1]):
+        path = ";".join(f"{name} ({filename}:{line})" for name, filename, line in stack)
+        lines.append(f"{path} {count}")
+    return "\n".join(lines) + "\n"
+
+class ProfilerBusy(Exception):
+    pass
+
+# Captures are tail profiles of the whole event loop, not of one request
+CAPTURE_NOTE = (
+    "Stack samples start once the request passes the slow-request threshold and cover "
+    "the whole event-loop thread, so they include other requests running at the same "
+    "time; time spent awaiting SurrealDB shows up as the loop's idle select frame. "
+    "Use the query list for I/O time."
+)
+
+class Profiler:
+    def __init__(self, interval: float = 0.005, slow_request_threshold: float = 1.0, max_captures: int = 20, max_concurrent_captures: int = 4):
+        self.interval = interval
+        self.slow_request_threshold = slow_request_threshold
+        self.max_concurrent_captures = max_concurrent_captures
+        self.captures: Deque[Dict[str, Any]] = deque(maxlen=max_captures)
+        self._capture_seq = 0
+        self._active_captures = 0
+        self._on_demand_running = False
+
+    async def profile_for(self, seconds: float) -> Dict[Stack, int]:
+        if self._on_demand_running:
+            raise ProfilerBusy("A profile is already being recorded")
+        self._on_demand_running = True
+        sampler = StackSampler(threading.get_ident(), self.interval)
+        sampler.start()
+        try:
+            await asyncio.sleep(seconds)
+        finally:
+            counts = sampler.stop()
+            self._on_demand_running = False
+        return counts
+
+    @asynccontextmanager
+    async def track_request(self, method: str, path: str):
+        if self.slow_request_threshold <= 0:
+            yield
+            return
+
+        queries: List[Dict[str, Any]] = []
+        token = _request_queries.set(queries)
+        state: Dict[str, Any] = {"sampler": None}
+        thread_id = threading.get_ident()
+
+        def begin_sampling() -> None:
+            # Only requests that are already slow pay for sampling
+            if self._active_captures >= self.max_concurrent_captures:
+                return
+            self._active_captures += 1
+            sampler = StackSampler(thread_id, self.interval)
+            sampler.start()
+            state["sampler"] = sampler
+
+        started = time.perf_counter()
+        timer = asyncio.get_running_loop().call_later(self.slow_request_threshold, begin_sampling)
+        try:
+            yield
+        finally:
+            timer.cancel()
+            duration = time.perf_counter() - started
+            sampler = state["sampler"]
+            counts = {}
+            if sampler is not None:
+                counts = sampler.stop()
+                self._active_captures -= 1
+            _request_queries.reset(token)
+            if duration >= self.slow_request_threshold:
+                self._capture_seq += 1
+                self.captures.append({
+                    "id": self._capture_seq,
+                    "method": method,
+                    "path": path,
+                    "duration_ms": round(duration * 1000, 2),
+                    "sampled_ms": round((sampler.stopped_at - sampler.started_at) * 1000, 2) if sampler is not None else 0.0,
+                    "captured_at": datetime.utcnow().isoformat(),
+                    "note": CAPTURE_NOTE,
+                    "queries": queries,
+                    "samples": counts,
+                })
+
+    def record_query(self, query: str, duration: float) -> None:
+        queries = _request_queries.get()
+        if queries is not None:
+            queries.append({"query": query, "duration_ms": round(duration * 1000, 2)})
+
+    def list_captures(self) -> List[Dict[str, Any]]:
+        return [
+            {k: v for k, v in capture.items() if k not in ("queries", "samples")} | {"query_count": len(capture["queries"]), "sample_count": sum(capture["samples"].values())}
+            for capture in reversed(self.captures)
+        ]
+
+    def get_capture(self, capture_id: int) -> Optional[Dict[str, Any]]:
+        for capture in self.captures:
+            if capture["id"] == capture_id:
+                return capture
+        return None
+
+class SlowRequestMiddleware:
+    # Plain ASGI middleware (BaseHTTPMiddleware wraps every request in extra tasks and
+    # streams). Admin endpoints are skipped: on-demand profiles run past the threshold
+    # by design and would otherwise start a second sampler and capture themselves.
+    def __init__(self, app, profiler: Profiler, skip_prefixes: Tuple[str, ...] = ("/api/admin/",)):
+        self.app = app
+        self.profiler = profiler
+        self.skip_prefixes = skip_prefixes
+
+    async def __call__(self, scope, receive, send) -> None:
+        if scope["type"] != "http" or self.profiler.slow_request_threshold <= 0 or scope["path"].startswith(self.skip_prefixes):
+            await self.app(scope, receive, send)
+            return
+        async with self.profiler.track_request(scope["method"], scope["path"]):
+            await self.app(scope, receive, send)
@@ -0,0 +1,266 @@
+import json
+import re
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Any, Dict, FrozenSet, List, Optional, Set, Tuple
+
+_IDENT = r"[A-Za-z_][A-Za-z0-9_]*"
+_FROM_RE = re.compile(r"\bFROM\s+(?:ONLY\s+)?", re.IGNORECASE)
+# Clauses that may follow the FROM target list
+_FROM_END_RE = re.compile(r"\b(?:WHERE|SPLIT|GROUP|ORDER|LIMIT|START|FETCH|TIMEOUT|PARALLEL|EXPLAIN|WITH|OMIT)\b|[;)]", re.IGNORECASE)
+# A table name or a simple record id; params, functions and subqueries do not match
+_FROM_TARGET_RE = re.compile(rf"^({_IDENT})(?::[A-Za-z0-9_]+)?$")
+# Results of these change between calls even when no table was written
+_VOLATILE_RE = re.compile(r"\b(?:time::now|rand(?:::\w+)*|sleep)\s*\(", re.IGNORECASE)
+_STRING_RE = re.compile(r"'(?:[^'\\]|\\.)*'|\"(?:[^\"\\]|\\.)*\"")
+_ARROW_CHAIN_RE = re.compile(rf"(?:(?:->|<-)\(?{_IDENT}\)?)+")
+_ARROW_NAME_RE = re.compile(rf"(?:->|<-)\(?({_IDENT})")
+_WRITE_RE = re.compile(rf"^(?:CREATE|UPDATE|UPSERT|DELETE)\s+(?:ONLY\s+)?(?:FROM\s+)?({_IDENT})", re.IGNORECASE)
+_INSERT_RE = re.compile(rf"^INSERT\s+(?:RELATION\s+)?(?:IGNORE\s+)?INTO\s+({_IDENT})", re.IGNORECASE)
+_RELATE_RE = re.compile(rf"^RELATE\s+(?:ONLY\s+)?[^;]*?->\s*({_IDENT})\s*->", re.IGNORECASE)
+_NEUTRAL_KEYWORDS = ("BEGIN", "COMMIT", "CANCEL", "USE")
+
+@dataclass
+class QueryPlan:
+    cacheable: bool = False
+    read_tables: FrozenSet[str] = frozenset()
+    write_tables: Set[str] = field(default_factory=set)
+    deleted_tables: Set[str] = field(default_factory=set)
+    edge_tables: Set[str] = field(default_factory=set)
+    invalidate_all: bool = False
+
+def split_statements(query: str) -> List[str]:
+    # Splits on semicolons outside string literals
+    statements = []
+    current = []
+    quote = None
+    escaped = False
+    for char in query:
+        if quote:
+            if escaped:
+                escaped = False
+            elif char == "\\":
+                escaped = True
+            elif char == quote:
+                quote = None
+        elif char in "'\"":
+            quote = char
+        elif char == ";":
+            statement = "".join(current).strip()
+            if statement:
+                statements.append(statement)
+            current = []
+            continue
+        current.append(char)
+    statement = "".join(current).strip()
+    if statement:
+        statements.append(statement)
+    return statements
+
+def strip_literals(statement: str) -> str:
+    # Empties string literals so their contents never look like keywords or record ids
+    return _STRING_RE.sub(lambda m: m.group(0)[0] * 2, statement)
+
+def from_tables(statement: str) -> Optional[Set[str]]:
+    # Tables named by every FROM clause, or None when a target is not a plain table or
+    # record id (a param, a function such as type::table(), a subquery, ...)
+    tables: Set[str] = set()
+    for match in _FROM_RE.finditer(statement):
+        rest = statement[match.end():]
+        end = _FROM_END_RE.search(rest)
+        for target in (rest[:end.start()] if end else rest).split(","):
+            table = _FROM_TARGET_RE.match(target.strip())
+            if table is None:
+                return None
+            tables.add(table.group(1).lower())
+    return tables
+
+def traversed_tables(statement: str) -> Tuple[Set[str], Set[str]]:
+    # In ->rated->movie->belongs_to->genre the edges sit at even positions
+    edges: Set[str] = set()
+    nodes: Set[str] = set()
+    for chain in _ARROW_CHAIN_RE.finditer(statement):
+        for position, name in enumerate(_ARROW_NAME_RE.findall(chain.group(0))):
+            (edges if position % 2 == 0 else nodes).add(name.lower())
+    return edges, nodes
+
+def analyze_query(query: str) -> QueryPlan:
+    plan = QueryPlan()
+    statements = [strip_literals(s) for s in split_statements(query)]
+    if not statements:
+        return plan
+
+    all_selects = True
+    read_tables: Set[str] = set()
+    for statement in statements:
+        keyword = statement.split(None, 1)[0].upper()
+        edges, nodes = traversed_tables(statement)
+        plan.edge_tables |= edges
+
+        if keyword == "SELECT":
+            tables = from_tables(statement)
+            if not tables or _VOLATILE_RE.search(statement):
+                all_selects = False
+            read_tables |= tables or set()
+            read_tables |= edges | nodes
+            continue
+
+        all_selects = False
+        if keyword in _NEUTRAL_KEYWORDS or keyword in ("INFO", "SHOW"):
+            continue
+
+        relate = _RELATE_RE.match(statement)
+        if relate:
+            edge = relate.group(1).lower()
+            plan.write_tables.add(edge)
+            plan.edge_tables.add(edge)
+            continue
+
+        write = _WRITE_RE.match(statement) or _INSERT_RE.match(statement)
+        if write:
+            table = write.group(1).lower()
+            plan.write_tables.add(table)
+            if keyword == "DELETE":
+                plan.deleted_tables.add(table)
+            continue
+
+        # DEFINE, REMOVE, LET and anything else we cannot attribute to a table
+        plan.invalidate_all = True
+
+    plan.cacheable = all_selects and bool(read_tables)
+    plan.read_tables = frozenset(read_tables)
+    return plan
+
+@dataclass
+class _Entry:
+    # Results are kept as their JSON encoding: decoding a fresh copy per hit is several
+    # times faster than deep-copying the rows, and callers may mutate what they get
+    data: bytes
+    tables: FrozenSet[str]
+    size: int
+    expires_at: float
+
+class QueryCache:
+    # Read-through cache for SurrealClient.query. Entries are keyed by statement text and
+    # variables and tagged with the tables the statement reads; any write statement sent
+    # through the same client drops the entries tagged with the tables it touches.
+    def __init__(self, max_entries: int = 1000, max_bytes: int = 32 * 1024 * 1024, ttl: float = 60.0, table_ttls: Optional[Dict[str, float]] = None):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.table_ttls = table_ttls or {}
+        self._entries: "OrderedDict[Tuple[str, str], _Entry]" = OrderedDict()
+        self._bytes = 0
+        self._generations: Dict[str, int] = {}
+        self._epoch = 0
+        # Relation tables seen in RELATE statements and graph traversals. Deleting a
+        # record also removes its edges, so those tables are invalidated with it.
+        self._edge_tables: Set[str] = set()
+        self._table_stats: Dict[str, Dict[str, int]] = {}
+        self._evictions = 0
+
+    def analyze(self, query: str) -> QueryPlan:
+        return analyze_query(query)
+
+    def get(self, query: str, variables: Optional[Dict[str, Any]], tables: FrozenSet[str]) -> Tuple[bool, Any]:
+        key = self._key(query, variables)
+        entry = self._entries.get(key)
+        if entry is not None and entry.expires_at <= time.monotonic():
+            self._remove(key)
+            entry = None
+
+        self._record(tables, "hits" if entry is not None else "misses")
+        if entry is None:
+            return False, None
+
+        self._entries.move_to_end(key)
+        return True, json.loads(entry.data)
+
+    def generation(self, tables: FrozenSet[str]) -> Tuple[int, Tuple[int, ...]]:
+        return self._epoch, tuple(self._generations.get(t, 0) for t in sorted(tables))
+
+    def put(self, query: str, variables: Optional[Dict[str, Any]], tables: FrozenSet[str], result: List[Any], generation: Tuple[int, Tuple[int, ...]]) -> None:
+        # A write that landed while the read was in flight makes its result suspect
+        if generation != self.generation(tables):
+            return
+
+        try:
+            data = json.dumps(result, separators=(",", ":"), default=str).encode("utf-8")
+        except (TypeError, ValueError):
+            return
+        size = len(data)
+        if size > self.max_bytes:
+            return
+
+        ttl = min([self.ttl] + [self.table_ttls[t] for t in tables if t in self.table_ttls])
+        if ttl <= 0:
+            return
+
+        key = self._key(query, variables)
+        if key in self._entries:
+            self._remove(key)
+        self._entries[key] = _Entry(data, tables, size, time.monotonic() + ttl)
+        self._bytes += size
+
+        while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+            oldest = next(iter(self._entries))
+            self._remove(oldest)
+            self._evictions += 1
+
+    def apply_writes(self, plan: QueryPlan) -> None:
+        self._edge_tables |= plan.edge_tables
+        if plan.invalidate_all:
+            self.clear()
+            return
+        tables = set(plan.write_tables)
+        if plan.deleted_tables - self._edge_tables:
+            tables |= self._edge_tables
+        if tables:
+            self.invalidate(tables)
+
+    def invalidate(self, tables: Set[str]) -> None:
+        tables = {t.lower() for t in tables}
+        for table in tables:
+            self._generations[table] = self._generations.get(table, 0) + 1
+            self._record({table}, "invalidations")
+        stale = [key for key, entry in self._entries.items() if entry.tables & tables]
+        for key in stale:
+            self._remove(key)
+
+    def clear(self) -> None:
+        self._epoch += 1
+        self._entries.clear()
+        self._bytes = 0
+
+    def stats(self) -> Dict[str, Any]:
+        tables = {}
+        for table, counts in sorted(self._table_stats.items()):
+            lookups = counts.get("hits", 0) + counts.get("misses", 0)
+            tables[table] = {
+                "hits": counts.get("hits", 0),
+                "misses": counts.get("misses", 0),
+                "invalidations": counts.get("invalidations", 0),
+                "hit_rate": round(counts.get("hits", 0) / lookups, 4) if lookups else 0.0,
+            }
+        return {
+            "entries": len(self._entries),
+            "bytes": self._bytes,
+            "max_entries": self.max_entries,
+            "max_bytes": self.max_bytes,
+            "evictions": self._evictions,
+            "tables": tables,
+        }
+
+    def _key(self, query: str, variables: Optional[Dict[str, Any]]) -> Tuple[str, str]:
+        return query.strip(), json.dumps(variables or {}, sort_keys=True, default=str)
+
+    def _remove(self, key: Tuple[str, str]) -> None:
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self._bytes -= entry.size
+
+    def _record(self, tables: Set[str], counter: str) -> None:
+        for table in tables:
+            counts = self._table_stats.setdefault(table, {})
+            counts[counter] = counts.get(counter, 0) + 1
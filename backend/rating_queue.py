@@ -0,0 +1,207 @@
+import asyncio
+import itertools
+from typing import Any, Dict, List, Optional, Tuple
+from surreal_client import SurrealClient
+
+class RatingQueueFull(Exception):
+    pass
+
+class RatingQueueClosed(Exception):
+    pass
+
+class RatingWriteQueue:
+    # Write-behind buffer for ratings: submissions are acknowledged once queued and
+    # flushed to SurrealDB in grouped transactions, either when `batch_size` ratings
+    # are waiting or `flush_interval` seconds after the first one arrived.
+    def __init__(self, client: SurrealClient, max_size: int = 1000, batch_size: int = 50, flush_interval: float = 0.05, enqueue_timeout: float = 2.0, max_retries: int = 3, max_requeues: int = 5):
+        self.client = client
+        self.max_size = max_size
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.enqueue_timeout = enqueue_timeout
+        self.max_retries = max_retries
+        # Batches that still fail after max_retries go back on the queue this many
+        # times before their ratings are given up on
+        self.max_requeues = max_requeues
+        self.dropped = 0
+        self._queue: Optional[asyncio.Queue] = None
+        self._worker: Optional[asyncio.Task] = None
+        self._closed = False
+        self._seq = itertools.count(1)
+        # user_id -> movie_id -> pending rating, used for read-your-writes overlays
+        self._pending: Dict[str, Dict[str, Dict[str, Any]]] = {}
+
+    async def start(self) -> None:
+        if self._worker is not None:
+            return
+        self._queue = asyncio.Queue(maxsize=self.max_size)
+        self._closed = False
+        self._worker = asyncio.create_task(self._run())
+
+    async def submit(self, user_id: str, movie_id: str, score: int, created_at: str) -> Dict[str, Any]:
+        if self._closed or self._queue is None:
+            raise RatingQueueClosed("Rating queue is not accepting writes")
+
+        entry = {
+            "seq": next(self._seq),
+            "user_id": user_id,
+            "movie_id": movie_id,
+            "score": score,
+            "created_at": created_at,
+            "requeues": 0,
+        }
+        # Register the overlay before enqueueing so the worker can never flush it first
+        self._pending.setdefault(user_id, {})[movie_id] = entry
+        try:
+            # Backpressure: wait for room up to enqueue_timeout, then reject
+            await asyncio.wait_for(self._queue.put(entry), timeout=self.enqueue_timeout)
+        except asyncio.TimeoutError:
+            self._forget(entry)
+            raise RatingQueueFull(f"Rating queue is full ({self.max_size} pending writes)")
+        except BaseException:
+            # Cancelled while waiting for room; nothing was queued, so nothing will flush
+            self._forget(entry)
+            raise
+
+        return {
+            "status": "queued",
+            "in": f"user:{user_id}",
+            "out": f"movie:{movie_id}",
+            "score": score,
+            "created_at": created_at,
+        }
+
+    def pending_for_user(self, user_id: str) -> List[Dict[str, Any]]:
+        return list(self._pending.get(user_id, {}).values())
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "queued": self._queue.qsize() if self._queue is not None else 0,
+            "max_size": self.max_size,
+            "pending_users": len(self._pending),
+            "dropped": self.dropped,
+            "closed": self._closed,
+        }
+
+    async def shutdown(self) -> None:
+        self._closed = True
+        if self._queue is None or self._worker is None:
+            return
+        # A None sentinel lets the worker flush everything queued before it and exit
+        await self._queue.put(None)
+        await self._worker
+        self._worker = None
+
+    async def _run(self) -> None:
+        loop = asyncio.get_running_loop()
+        stopping = False
+        while not stopping:
+            first = await self._queue.get()
+            if first is None:
+                break
+
+            batch = [first]
+            deadline = loop.time() + self.flush_interval
+            while len(batch) < self.batch_size:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    item = await asyncio.wait_for(self._queue.get(), timeout=timeout)
+                except asyncio.TimeoutError:
+                    break
+                if item is None:
+                    stopping = True
+                    break
+                batch.append(item)
+
+            await self._flush(batch)
+
+    async def _flush(self, batch: List[Dict[str, Any]]) -> None:
+        # Last write wins for repeated ratings of the same movie within a batch
+        # (requeued entries can arrive after newer ones, so compare sequence numbers)
+        latest: Dict[Tuple[str, str], Dict[str, Any]] = {}
+        for entry in batch:
+            key = (entry["user_id"], entry["movie_id"])
+            if key not in latest or latest[key]["seq"] < entry["seq"]:
+                latest[key] = entry
+        await self._write(list(latest.values()))
+
+    async def _write(self, entries: List[Dict[str, Any]]) -> None:
+        statements = ["BEGIN TRANSACTION;"]
+        for entry in entries:
+            user_ref = f"user:{entry['user_id']}"
+            movie_ref = f"movie:{entry['movie_id']}"
+            data = {"score": entry["score"], "created_at": entry["created_at"]}
+            statements.append(f"DELETE rated WHERE in = {user_ref} AND out = {movie_ref};")
+            statements.append(f"RELATE {user_ref}->rated->{movie_ref} SET {self.client._dict_to_set(data)};")
+        statements.append("COMMIT TRANSACTION;")
+        query = "\n".join(statements)
+
+        for attempt in range(self.max_retries):
+            try:
+                # The flattened query() result hides statement errors, and a failed
+                # transaction still answers HTTP 200, so check every statement
+                statuses = await self.client.query_raw(query)
+            except Exception as e:
+                if attempt < self.max_retries - 1:
+                    print(f"Rating batch flush failed: {e}. Retrying ({attempt + 1}/{self.max_retries})...")
+                    await asyncio.sleep(0.1 * (attempt + 1))
+                    continue
+                # The database itself is unreachable; every entry failed on its own account
+                print(f"Rating batch flush failed {self.max_retries} times: {e}")
+                self._requeue_or_drop(entries)
+                return
+
+            errors = [s.get("result") for s in statuses if isinstance(s, dict) and s.get("status") == "ERR"]
+            if not errors:
+                for entry in entries:
+                    self._forget(entry)
+                return
+            if len(entries) > 1:
+                # One bad rating fails the whole transaction; split the batch so the
+                # others still get written and only the failing entry is requeued
+                middle = len(entries) // 2
+                await self._write(entries[:middle])
+                await self._write(entries[middle:])
+                return
+            if attempt < self.max_retries - 1:
+                print(f"Rating write failed: {errors[0]}. Retrying ({attempt + 1}/{self.max_retries})...")
+                await asyncio.sleep(0.1 * (attempt + 1))
+            else:
+                print(f"Rating write failed {self.max_retries} times: {errors[0]}")
+                self._requeue_or_drop(entries)
+
+    def _requeue_or_drop(self, entries: List[Dict[str, Any]]) -> None:
+        lost = []
+        for entry in entries:
+            current = self._pending.get(entry["user_id"], {}).get(entry["movie_id"])
+            if current is not None and current["seq"] > entry["seq"]:
+                # A newer rating for the same movie is queued and will replace this one
+                continue
+            entry["requeues"] += 1
+            if not self._closed and entry["requeues"] <= self.max_requeues:
+                try:
+                    self._queue.put_nowait(entry)
+                    continue
+                except asyncio.QueueFull:
+                    pass
+            lost.append(entry)
+
+        for entry in lost:
+            self._forget(entry)
+        if lost:
+            self.dropped += len(lost)
+            pairs = ", ".join(f"user:{e['user_id']}->movie:{e['movie_id']} (score {e['score']})" for e in lost)
+            print(f"Dropped {len(lost)} queued ratings that could not be written: {pairs}")
+
+    def _forget(self, entry: Dict[str, Any]) -> None:
+        user_pending = self._pending.get(entry["user_id"])
+        if not user_pending:
+            return
+        current = user_pending.get(entry["movie_id"])
+        # Keep the overlay if a newer rating for the same movie was queued meanwhile
+        if current is not None and current["seq"] <= entry["seq"]:
+            del user_pending[entry["movie_id"]]
+        if not user_pending:
+            del self._pending[entry["user_id"]]
@@ -0,0 +1,187 @@
+import asyncio
+import hashlib
+import itertools
+import re
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+from surreal_client import SurrealClient
+from query_cache import QueryCache, analyze_query, split_statements, strip_literals
+
+CATALOGUE_TABLES = ("movie", "genre", "belongs_to")
+_USER_REF_RE = re.compile(r"\buser:([A-Za-z0-9_]+)")
+_SINGLE_RECORD_FROM_RE = re.compile(r"\bFROM\s+(?:ONLY\s+)?[A-Za-z_][A-Za-z0-9_]*:[A-Za-z0-9_]+\s*(?:FETCH\b|;|$)", re.IGNORECASE)
+_CREATE_WITHOUT_ID_RE = re.compile(r"^CREATE\s+(?:ONLY\s+)?([A-Za-z_][A-Za-z0-9_]*)\s+(?:SET|CONTENT)\b", re.IGNORECASE)
+_TRANSACTION_KEYWORDS = ("BEGIN", "COMMIT", "CANCEL")
+
+def parse_shard_spec(spec: str, user: str, password: str) -> List[SurrealClient]:
+    # "url|namespace|database,url|namespace|database,..."; several entries may point at
+    # one server with different namespaces
+    shards = []
+    for entry in spec.split(","):
+        entry = entry.strip()
+        if not entry:
+            continue
+        parts = entry.split("|")
+        if len(parts) != 3:
+            raise ValueError(f"Invalid shard '{entry}', expected url|namespace|database")
+        url, namespace, database = parts
+        shards.append(SurrealClient(url=url, user=user, password=password, namespace=namespace, database=database))
+    if not shards:
+        raise ValueError("SURREAL_SHARDS does not list any shard")
+    return shards
+
+class ShardedSurrealClient(SurrealClient):
+    # Drop-in SurrealClient that spreads user data over several SurrealDB endpoints.
+    # Users and their outgoing `rated` edges live on the shard their record id hashes
+    # to (rendezvous hashing, so adding a shard only moves the users that land on it),
+    # the small movie/genre catalogue is written to every shard so per-user traversals
+    # stay local, and reads that span users are scattered to all shards and gathered.
+    # Caching and query listeners from SurrealClient.query apply to the routed result.
+    def __init__(self, shards: List[SurrealClient], cache: Optional[QueryCache] = None, catalogue_tables: Iterable[str] = CATALOGUE_TABLES):
+        # The base client's own connection is never used, so its __init__ is skipped
+        self.shards = shards
+        self.cache = cache
+        self.query_listeners: List[Callable[[str, float], None]] = []
+        self.catalogue_tables = set(catalogue_tables)
+        self.url = ",".join(shard.url for shard in shards)
+        self.namespace = shards[0].namespace
+        self.database = shards[0].database
+        self.token: Optional[str] = "sharded"
+        self._round_robin = itertools.cycle(range(len(shards)))
+        self._keys = [f"{s.url}|{s.namespace}|{s.database}".encode("utf-8") for s in shards]
+
+    async def connect(self) -> None:
+        await asyncio.gather(*(shard.connect() for shard in self.shards))
+
+    async def close(self) -> None:
+        await asyncio.gather(*(shard.close() for shard in self.shards))
+
+    def shard_for_user(self, user_id: str) -> int:
+        key = user_id.split(":", 1)[-1].encode("utf-8")
+        scores = [
+            int.from_bytes(hashlib.blake2b(shard_key + b"|" + key, digest_size=8).digest(), "big")
+            for shard_key in self._keys
+        ]
+        return scores.index(max(scores))
+
+    def route(self, statement: str) -> Tuple[str, List[int]]:
+        # Returns ("single" | "broadcast" | "scatter", shard indices)
+        keyword = statement.split(None, 1)[0].upper()
+        plan = analyze_query(statement)
+        # Record ids inside string literals (titles, reviews) are data, not routing keys
+        users = _USER_REF_RE.findall(strip_literals(statement))
+        all_shards = list(range(len(self.shards)))
+
+        if keyword == "SELECT":
+            if users and len(set(users)) == 1:
+                return "single", [self.shard_for_user(users[0])]
+            if plan.read_tables and plan.read_tables <= self.catalogue_tables:
+                return "single", [next(self._round_robin)]
+            return "scatter", all_shards
+
+        if keyword in ("INFO", "SHOW"):
+            return "scatter", all_shards
+
+        if plan.invalidate_all:
+            # Schema statements (DEFINE, REMOVE, ...) must reach every shard
+            return "broadcast", all_shards
+
+        created = _CREATE_WITHOUT_ID_RE.match(statement)
+        if created and created.group(1).lower() == "user":
+            raise ValueError("user records need an explicit id so they can be routed to their shard")
+
+        if users:
+            # The first user reference is the record itself or the edge's `in` side
+            return "single", [self.shard_for_user(users[0])]
+
+        if plan.write_tables and plan.write_tables <= self.catalogue_tables:
+            if created:
+                raise ValueError(f"Replicated {created.group(1)} records need an explicit id so every shard stores the same record")
+            return "broadcast", all_shards
+
+        if keyword in ("CREATE", "INSERT"):
+            digest = hashlib.blake2b(statement.encode("utf-8"), digest_size=8).digest()
+            return "single", [int.from_bytes(digest, "big") % len(self.shards)]
+
+        # Updates or deletes addressed by record id or WHERE clause only touch the
+        # shards that hold matching records
+        return "broadcast", all_shards
+
+    def _plan(self, query: str) -> Tuple[List[Tuple[str, str, List[int]]], bool]:
+        statements = split_statements(query)
+        transactional = any(s.split(None, 1)[0].upper() in _TRANSACTION_KEYWORDS for s in statements)
+        statements = [
+            s for s in statements
+            if s.split(None, 1)[0].upper() not in _TRANSACTION_KEYWORDS + ("USE",)
+        ]
+        return [(statement, *self.route(statement)) for statement in statements], transactional
+
+    def _shard_batches(self, routes: List[Tuple[str, str, List[int]]], transactional: bool) -> Dict[int, str]:
+        # Every shard gets its statements in their original order, wrapped in its own
+        # transaction when the caller asked for one
+        per_shard: Dict[int, List[str]] = {}
+        for statement, _, shards in routes:
+            for i in shards:
+                per_shard.setdefault(i, []).append(statement + ";")
+        batches = {}
+        for i, shard_statements in per_shard.items():
+            if transactional:
+                shard_statements = ["BEGIN TRANSACTION;"] + shard_statements + ["COMMIT TRANSACTION;"]
+            batches[i] = "\n".join(shard_statements)
+        return batches
+
+    async def _execute_raw(self, query: str, variables: Optional[Dict[str, Any]] = None, quiet: bool = False) -> List[Dict[str, Any]]:
+        # Statement statuses from every shard that ran part of the query
+        routes, transactional = self._plan(query)
+        batches = self._shard_batches(routes, transactional)
+        results = await asyncio.gather(*(self.shards[i].query_raw(batch, variables, quiet) for i, batch in batches.items()))
+        return [status for result in results for status in result]
+
+    async def _execute(self, query: str, variables: Optional[Dict[str, Any]] = None) -> List[Any]:
+        routes, transactional = self._plan(query)
+        if not routes:
+            return []
+
+        # Fast path: the whole query belongs to one shard and can be sent untouched
+        targets = {tuple(shards) for _, _, shards in routes}
+        if len(routes) == 1 or (len(targets) == 1 and all(mode == "single" for _, mode, _ in routes)):
+            statement, mode, shards = routes[0]
+            if len(shards) == 1:
+                return await self.shards[shards[0]].query(query, variables)
+            if mode == "scatter":
+                return await self._scatter(statement, shards, variables)
+            results = await asyncio.gather(*(self.shards[i].query(query, variables) for i in shards))
+            return results[0]
+
+        if not transactional:
+            # Statements run in their original order so the flattened rows line up
+            # with a single-database answer; broadcast writes report one shard's copy
+            rows: List[Any] = []
+            for statement, mode, shards in routes:
+                if mode == "scatter":
+                    rows.extend(await self._scatter(statement, shards, variables))
+                else:
+                    results = await asyncio.gather(*(self.shards[i].query(statement + ";", variables) for i in shards))
+                    rows.extend(results[0])
+            return rows
+
+        # Mixed transaction: every shard commits its own part. Atomicity holds per
+        # shard, not across shards.
+        batches = self._shard_batches(routes, transactional)
+        results = await asyncio.gather(*(self.shards[i].query(batch, variables) for i, batch in batches.items()))
+        return [row for result in results for row in result]
+
+    async def _scatter(self, statement: str, shards: List[int], variables: Optional[Dict[str, Any]]) -> List[Any]:
+        results = await asyncio.gather(*(self.shards[i].query(statement + ";", variables) for i in shards))
+        if _SINGLE_RECORD_FROM_RE.search(strip_literals(statement)) and all(len(r) <= 1 and all(isinstance(row, dict) for row in r) for r in results):
+            # FROM <record> returns one row per shard holding part of that record's
+            # graph neighbourhood (e.g. movie:x<-rated<-user); fold them into one row
+            merged: Dict[str, Any] = {}
+            for result in results:
+                for row in result:
+                    for key, value in row.items():
+                        if isinstance(value, list) and isinstance(merged.get(key), list):
+                            merged[key] = merged[key] + value
+                        elif key not in merged or merged[key] is None:
+                            merged[key] = value
+            return [merged] if merged else []
+        return [row for result in results for row in result]
@@ -1,8 +1,10 @@
 import httpx
-from typing import Any, Dict, List, Optional
+import time
+from typing import Any, Callable, Dict, List, Optional
+from query_cache import QueryCache
 
 class SurrealClient:
-    def __init__(self, url: str = "http://localhost:8000", user: str = "root", password: str = "root", namespace: str = "test", database: str = "test"):
+    def __init__(self, url: str = "http://localhost:8000", user: str = "root", password: str = "root", namespace: str = "test", database: str = "test", cache: Optional[QueryCache] = None):
         self.url = url
         self.user = user
         self.password = password
@@ -10,6 +12,9 @@ class SurrealClient:
         self.database = database
         self.token: Optional[str] = None
         self.client = httpx.AsyncClient(timeout=30.0)
+        self.cache = cache
+        # Called with (query, seconds) after every query, e.g. by the slow-request profiler
+        self.query_listeners: List[Callable[[str, float], None]] = []
 
     async def connect(self) -> None:
         import base64
@@ -32,42 +37,57 @@ class SurrealClient:
             raise Exception(f"Error connecting to SurrealDB: {e}")
 
     async def query(self, query: str, variables: Optional[Dict[str, Any]] = None) -> List[Any]:
-        if not self.token:
-            await self.connect()
-        
-        url = f"{self.url}/sql"
-        
-        final_query = query
-        if variables:
-            for key, value in variables.items():
-                if isinstance(value, str):
-                    final_query = final_query.replace(f"${key}", f"'{value}'")
-                else:
-                    final_query = final_query.replace(f"${key}", str(value))
-        
-        use_statement = f"USE NS {self.namespace} DB {self.database}; "
-        final_query = use_statement + final_query
-        
-        headers = {
-            "Authorization": f"Basic {self.token}",
-            "NS": self.namespace,
-            "DB": self.database,
-            "Content-Type": "text/plain",
-            "Accept": "application/json"
-        }
-        
-        print(f"Query: {final_query}")
-        print(f"Headers: NS={self.namespace}, DB={self.database}")
-        
-        response = await self.client.post(url, content=final_query, headers=headers)
-        
-        print(f"Response status: {response.status_code}")
-        
-        response.raise_for_status()
-        result = response.json()
-        
-        print(f"SurrealDB raw response: {result}")
-        print(f"Response type: {type(result)}")
+        if not self.query_listeners:
+            return await self._cached_query(query, variables)
+
+        started = time.perf_counter()
+        try:
+            return await self._cached_query(query, variables)
+        finally:
+            duration = time.perf_counter() - started
+            for listener in self.query_listeners:
+                listener(query, duration)
+
+    async def _cached_query(self, query: str, variables: Optional[Dict[str, Any]] = None) -> List[Any]:
+        if self.cache is None:
+            return await self._execute(query, variables)
+
+        plan = self.cache.analyze(query)
+        if not plan.cacheable:
+            try:
+                return await self._execute(query, variables)
+            finally:
+                self.cache.apply_writes(plan)
+
+        found, cached = self.cache.get(query, variables, plan.read_tables)
+        if found:
+            return cached
+        generation = self.cache.generation(plan.read_tables)
+        result = await self._execute(query, variables)
+        self.cache.put(query, variables, plan.read_tables, result, generation)
+        return result
+
+    async def query_raw(self, query: str, variables: Optional[Dict[str, Any]] = None, quiet: bool = False) -> List[Dict[str, Any]]:
+        # Per-statement responses ({"status", "result", "time"}) instead of the flattened
+        # rows, for callers that have to know whether every statement succeeded. quiet
+        # skips the request/response logging, for background pollers.
+        started = time.perf_counter()
+        try:
+            result = await self._execute_raw(query, variables, quiet)
+        finally:
+            if self.cache is not None:
+                plan = self.cache.analyze(query)
+                if not plan.cacheable:
+                    self.cache.apply_writes(plan)
+            duration = time.perf_counter() - started
+            for listener in self.query_listeners:
+                listener(query, duration)
+        if isinstance(result, dict):
+            return [result]
+        return result if isinstance(result, list) else []
+
+    async def _execute(self, query: str, variables: Optional[Dict[str, Any]] = None) -> List[Any]:
+        result = await self._execute_raw(query, variables)
         
         if isinstance(result, list):
             parsed_results = []
@@ -110,6 +130,48 @@ class SurrealClient:
             return [result]
         return []
 
+    async def _execute_raw(self, query: str, variables: Optional[Dict[str, Any]] = None, quiet: bool = False) -> Any:
+        if not self.token:
+            await self.connect()
+        
+        url = f"{self.url}/sql"
+        
+        final_query = query
+        if variables:
+            for key, value in variables.items():
+                if isinstance(value, str):
+                    final_query = final_query.replace(f"${key}", f"'{value}'")
+                else:
+                    final_query = final_query.replace(f"${key}", str(value))
+        
+        use_statement = f"USE NS {self.namespace} DB {self.database}; "
+        final_query = use_statement + final_query
+        
+        headers = {
+            "Authorization": f"Basic {self.token}",
+            "NS": self.namespace,
+            "DB": self.database,
+            "Content-Type": "text/plain",
+            "Accept": "application/json"
+        }
+        
+        if not quiet:
+            print(f"Query: {final_query}")
+            print(f"Headers: NS={self.namespace}, DB={self.database}")
+        
+        response = await self.client.post(url, content=final_query, headers=headers)
+        
+        if not quiet:
+            print(f"Response status: {response.status_code}")
+        
+        response.raise_for_status()
+        result = response.json()
+        
+        if not quiet:
+            print(f"SurrealDB raw response: {result}")
+            print(f"Response type: {type(result)}")
+        return result
+
     async def create(self, table: str, data: Dict[str, Any], record_id: Optional[str] = None) -> Dict[str, Any]:
         if record_id:
             query = f"CREATE {table}:{record_id} SET {self._dict_to_set(data)};"
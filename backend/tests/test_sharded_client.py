@@ -0,0 +1,71 @@
+import asyncio
+from typing import Any, Dict, List, Optional
+from sharded_client import ShardedSurrealClient
+from surreal_client import SurrealClient
+
+class FakeShard(SurrealClient):
+    # Records the statements it receives and answers from canned rows; never
+    # touches the network
+    def __init__(self, name: str, rows: Optional[List[Any]] = None):
+        super().__init__(url=f"http://{name}", namespace="test", database=name)
+        self.rows = rows or []
+        self.received: List[str] = []
+
+    async def query(self, query: str, variables: Optional[Dict[str, Any]] = None) -> List[Any]:
+        self.received.append(query)
+        return list(self.rows)
+
+def make_client(rows_per_shard: Optional[List[List[Any]]] = None) -> ShardedSurrealClient:
+    rows_per_shard = rows_per_shard or [[], [], []]
+    return ShardedSurrealClient([FakeShard(f"shard{i}", rows) for i, rows in enumerate(rows_per_shard)])
+
+def user_on_other_shard(client: ShardedSurrealClient, user: str) -> str:
+    home = client.shard_for_user(user)
+    return next(f"user:u{i}" for i in range(100) if client.shard_for_user(f"user:u{i}") != home)
+
+def test_user_read_goes_to_the_users_shard():
+    client = make_client()
+    mode, shards = client.route("SELECT ->rated->movie.* AS movies FROM user:alice")
+    assert mode == "single"
+    assert shards == [client.shard_for_user("user:alice")]
+
+def test_edge_write_follows_the_in_side():
+    client = make_client()
+    mode, shards = client.route("RELATE user:alice->rated->movie:m1 SET score = 8")
+    assert (mode, shards) == ("single", [client.shard_for_user("user:alice")])
+
+def test_user_ids_inside_literals_are_ignored():
+    client = make_client()
+    other = user_on_other_shard(client, "user:alice")
+    mode, shards = client.route(f"SELECT * FROM rated WHERE in = user:alice AND note = '{other} said so'")
+    assert (mode, shards) == ("single", [client.shard_for_user("user:alice")])
+
+    # A catalogue write mentioning a user in its text is still replicated
+    mode, shards = client.route(f"UPDATE movie:m1 SET title = \"{other}: the movie\"")
+    assert (mode, shards) == ("broadcast", [0, 1, 2])
+
+def test_reads_across_users_scatter():
+    client = make_client()
+    mode, shards = client.route("SELECT * FROM rated WHERE score > 7")
+    assert (mode, shards) == ("scatter", [0, 1, 2])
+
+def test_semicolons_inside_literals_do_not_split_statements():
+    client = make_client()
+    routes, transactional = client._plan("UPDATE movie:m1 SET title = 'Part 1; Part 2';")
+    assert not transactional
+    assert [(statement, mode) for statement, mode, _ in routes] == [("UPDATE movie:m1 SET title = 'Part 1; Part 2'", "broadcast")]
+
+def test_scatter_folds_single_record_neighbourhoods():
+    client = make_client([
+        [{"id": "movie:m1", "title": "Heat", "raters": ["user:a"]}],
+        [{"id": "movie:m1", "title": None, "raters": ["user:b", "user:c"]}],
+        [],
+    ])
+    rows = asyncio.run(client._scatter("SELECT id, title, <-rated<-user AS raters FROM movie:m1", [0, 1, 2], None))
+    assert rows == [{"id": "movie:m1", "title": "Heat", "raters": ["user:a", "user:b", "user:c"]}]
+
+def test_scatter_concatenates_table_reads():
+    client = make_client([[{"id": "rated:1"}], [{"id": "rated:2"}, {"id": "rated:3"}], []])
+    rows = asyncio.run(client._scatter("SELECT * FROM rated", [0, 1, 2], None))
+    assert rows == [{"id": "rated:1"}, {"id": "rated:2"}, {"id": "rated:3"}]
+    assert all(shard.received == ["SELECT * FROM rated;"] for shard in client.shards)
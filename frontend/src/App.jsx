@@ -1,6 +1,7 @@
 import React, { useState, useEffect } from 'react'
 import { BrowserRouter as Router, Routes, Route, Link, useNavigate } from 'react-router-dom'
 import { api } from './api/client'
+import { syncCollections } from './api/deltaSync'
 import { ToastProvider, useToast } from './components/Toast'
 import GraphVisualization from './components/GraphVisualization'
 import './App.css'
@@ -129,8 +130,8 @@ const Movies = () => {
 
   const loadAllMovies = async () => {
     try {
-      const response = await api.get('/api/movies?all=true')
-      setAllMovies(response.data || [])
+      const { movies } = await syncCollections('movies', '/api/movies/changes', ['movies'])
+      setAllMovies([...movies].sort((a, b) => (b.year || 0) - (a.year || 0)))
     } catch (error) {
       console.error('Failed to load all movies:', error)
     } finally {
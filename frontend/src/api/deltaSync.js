@@ -0,0 +1,75 @@
+import { api } from './client'
+
+// v2: drops caches written while ratings without ids collapsed into one entry
+const STORAGE_PREFIX = 'cinebrain-sync:v2:'
+const memoryCache = {}
+
+export const loadSynced = (key) => {
+  if (memoryCache[key]) {
+    return memoryCache[key]
+  }
+  try {
+    const stored = localStorage.getItem(STORAGE_PREFIX + key)
+    if (stored) {
+      memoryCache[key] = JSON.parse(stored)
+      return memoryCache[key]
+    }
+  } catch (e) {
+    console.error('Failed to read synced data:', e)
+  }
+  return null
+}
+
+export const saveSynced = (key, version, data) => {
+  memoryCache[key] = { version, data }
+  try {
+    if (version === null || version === undefined) {
+      localStorage.removeItem(STORAGE_PREFIX + key)
+    } else {
+      localStorage.setItem(STORAGE_PREFIX + key, JSON.stringify(memoryCache[key]))
+    }
+  } catch (e) {
+    // Large graphs can exceed the storage quota; the in-memory copy still works
+    console.warn('Failed to persist synced data:', e)
+  }
+}
+
+// There is at most one rating per user and movie, and binary graph payloads leave
+// out rating ids, so ratings are matched by their endpoints
+const itemKeys = {
+  ratings: (item) => (item.source && item.target ? `${item.source}|${item.target}` : null)
+}
+const idKey = (item) => (item.id !== undefined && item.id !== null && item.id !== '' ? item.id : null)
+
+const applyDelta = (items, delta, keyOf = idKey) => {
+  // Items without a key cannot be matched against the delta; keep them as they are
+  // rather than letting them collapse into a single Map entry
+  const anonymous = items.filter((item) => keyOf(item) === null)
+  const byKey = new Map(items.filter((item) => keyOf(item) !== null).map((item) => [keyOf(item), item]))
+  // Removals name record ids
+  const removed = new Set(delta.removed)
+  byKey.forEach((item, key) => {
+    if (removed.has(item.id)) {
+      byKey.delete(key)
+    }
+  })
+  delta.upserted.forEach((item) => byKey.set(keyOf(item), { ...byKey.get(keyOf(item)), ...item }))
+  return anonymous.concat(Array.from(byKey.values()))
+}
+
+// Fetches only what changed since the cached version from a /changes endpoint and
+// merges it into the cached collections, or replaces them when the server answers
+// with a full snapshot.
+export const syncCollections = async (key, endpoint, collections) => {
+  const cached = loadSynced(key)
+  const hasVersion = cached && cached.version !== null && cached.version !== undefined
+  const response = await api.get(endpoint, { params: hasVersion ? { since: cached.version } : {} })
+  const { version, full, ...payload } = response.data
+
+  const data = {}
+  collections.forEach((name) => {
+    data[name] = full ? (payload[name] || []) : applyDelta(cached.data[name] || [], payload[name], itemKeys[name])
+  })
+  saveSynced(key, version, data)
+  return data
+}
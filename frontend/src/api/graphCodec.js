@@ -0,0 +1,47 @@
+export const GRAPH_BINARY_MEDIA_TYPE = 'application/vnd.cinebrain.graph+binary'
+
+// Decodes the columnar payload produced by backend/graph_codec.py into the same
+// { users, movies, ratings } shape that /api/graph/data returns as JSON.
+export const decodeGraphBinary = (buffer) => {
+  const view = new DataView(buffer)
+  const magic = String.fromCharCode(...new Uint8Array(buffer, 0, 4))
+  if (magic !== 'CBG1') {
+    throw new Error(`Unexpected graph payload format: ${magic}`)
+  }
+
+  const headerLength = view.getUint32(4, true)
+  const header = JSON.parse(new TextDecoder().decode(new Uint8Array(buffer, 8, headerLength)))
+  const edgeCount = header.edge_count
+
+  let offset = 8 + headerLength
+  offset += (4 - (offset % 4)) % 4
+  const sources = new Uint32Array(buffer, offset, edgeCount)
+  offset += edgeCount * 4
+  const targets = new Uint32Array(buffer, offset, edgeCount)
+  offset += edgeCount * 4
+  const scores = new Uint8Array(buffer, offset, edgeCount)
+
+  const users = header.users.ids.map((id, i) => ({
+    id,
+    name: header.users.names[i],
+    email: header.users.emails[i]
+  }))
+  const movies = header.movies.ids.map((id, i) => ({
+    id,
+    title: header.movies.titles[i],
+    year: header.movies.years[i],
+    director: header.movies.directors[i]
+  }))
+
+  const nodeIds = header.users.ids.concat(header.movies.ids)
+  const ratings = new Array(edgeCount)
+  for (let i = 0; i < edgeCount; i++) {
+    ratings[i] = {
+      source: nodeIds[sources[i]],
+      target: nodeIds[targets[i]],
+      score: scores[i]
+    }
+  }
+
+  return { users, movies, ratings }
+}
@@ -2,6 +2,8 @@ import React, { useEffect, useRef, useState } from 'react'
 import { Link, useNavigate } from 'react-router-dom'
 import * as d3 from 'd3'
 import { api } from '../api/client'
+import { GRAPH_BINARY_MEDIA_TYPE, decodeGraphBinary } from '../api/graphCodec'
+import { loadSynced, saveSynced, syncCollections } from '../api/deltaSync'
 import '../App.css'
 import './GraphVisualization.css'
 
@@ -40,11 +42,34 @@ const GraphVisualization = () => {
   const fetchGraphData = async () => {
     try {
       setLoading(true)
-      const response = await api.get('/api/graph/data')
-      setGraphData(response.data)
+      const cached = loadSynced('graph')
+      if (cached && cached.version !== null && cached.version !== undefined) {
+        setGraphData(await syncCollections('graph', '/api/graph/changes', ['users', 'movies', 'ratings']))
+      } else {
+        const response = await api.get('/api/graph/data', {
+          headers: { Accept: `${GRAPH_BINARY_MEDIA_TYPE}, application/json;q=0.9` },
+          responseType: 'arraybuffer'
+        })
+        const contentType = response.headers['content-type'] || ''
+        const data = contentType.startsWith(GRAPH_BINARY_MEDIA_TYPE)
+          ? decodeGraphBinary(response.data)
+          : JSON.parse(new TextDecoder().decode(response.data))
+        const version = response.headers['x-graph-version']
+        saveSynced('graph', version ? Number(version) : null, data)
+        setGraphData(data)
+      }
       setError(null)
     } catch (err) {
-      setError(err.response?.data?.detail || 'Failed to load graph data')
+      let detail = err.response?.data?.detail
+      if (err.response?.data instanceof ArrayBuffer) {
+        // Binary requests get their error bodies as raw bytes too
+        try {
+          detail = JSON.parse(new TextDecoder().decode(err.response.data)).detail
+        } catch (e) {
+          detail = undefined
+        }
+      }
+      setError(detail || 'Failed to load graph data')
       console.error('Error fetching graph data:', err)
     } finally {
       setLoading(false)
@@ -0,0 +1,31 @@
+#!/bin/bash
+
+set -e
+
+SHARDS=${1:-3}
+BASE_PORT=${BASE_PORT:-8100}
+
+if ! command -v surreal >/dev/null 2>&1; then
+    echo "The surreal CLI is required: https://surrealdb.com/install"
+    exit 1
+fi
+
+SPEC=""
+for i in $(seq 0 $((SHARDS - 1))); do
+    PORT=$((BASE_PORT + i))
+    echo "Starting shard $i on port $PORT..."
+    surreal start --log warn --user root --pass root --bind "0.0.0.0:$PORT" memory > "/tmp/cinebrain-shard-$i.log" 2>&1 &
+    echo $! > "/tmp/cinebrain-shard-$i.pid"
+    SPEC="${SPEC:+$SPEC,}http://127.0.0.1:$PORT|cinebrain|cinebrain"
+done
+
+echo "Waiting for shards to be ready..."
+sleep 3
+
+echo ""
+echo "✅ $SHARDS shards running!"
+echo "Start the backend with:"
+echo "  SURREAL_SHARDS=\"$SPEC\" uvicorn app:app --port 8001"
+echo ""
+echo "To stop them:"
+echo "  kill \$(cat /tmp/cinebrain-shard-*.pid)"